@@ -0,0 +1,283 @@
+"""Read-only JSON API over the prepared practice dataset and organisation structures.
+
+    GET /api/practices                              practice names
+    GET /api/practices/<name>                       details and coordinates of one practice
+    GET /api/practices/<name>/organization          its organisation structure
+    GET /api/search?q=<prefix>                      practice names starting with, or with a word starting with, q
+    GET /api/filter?term=..[&term=..][&column=..][&field=..]
+                                                    practices containing every term, optionally only in
+                                                    ``column``s, returning only the ``field``s
+    GET /api/nearby?practice=<name>[&n=5] | ?lat=..&lon=..[&km=10]
+                                                    nearest practices, or all within ``km``
+
+List endpoints take ``offset`` and ``limit`` (default 50, at most 1000) and
+return ``{"total", "offset", "limit", "results"}``. Acquisition dates are
+``null`` where the workbook has none. Responses carry an ETag and are cached
+per dataset version.
+
+There is no authentication, and practice details include every column,
+Shark and Fish emails and shareholdings among them, so bind it only where
+every client may see that data. The app serves the API only when
+PRACTICES_API_PORT is set (on PRACTICES_API_HOST, 127.0.0.1 by default),
+from the same dataset and org store it uses; it also runs on its own:
+
+    python api.py [--host 127.0.0.1] [--port 8767]
+"""
+import argparse
+import collections
+import hashlib
+import http.server
+import json
+import sys
+import threading
+import urllib.parse
+
+from data_prep import NO_ACQUISITION_DATE, DatasetStore
+from http_service import ServiceServer, start_server
+from org_store import OrgStore
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+MAX_NEARBY = 50
+RESPONSE_CACHE_ENTRIES = 1024
+
+NEARBY_FIELDS = ['Practice Name', 'Full Address', 'Country', 'Latitude', 'Longitude']
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _number(query, name, default, convert=int, low=None, high=None):
+    value = _param(query, name)
+    if value is None:
+        return default
+    try:
+        value = convert(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be a number") from None
+    if low is not None and value < low or high is not None and value > high:
+        raise ApiError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _page(query):
+    return _number(query, 'offset', 0, low=0), _number(query, 'limit', DEFAULT_LIMIT, low=1, high=MAX_LIMIT)
+
+
+def _records(df):
+    if 'Acquisition date' in df:
+        # The placeholder for a missing or unparseable date is written as null
+        dates = df['Acquisition date']
+        df = df.assign(**{'Acquisition date': dates.mask(dates == NO_ACQUISITION_DATE)})
+    # pandas' JSON writer handles NaN, timestamps and numpy scalars far faster than json.dumps
+    return df.to_json(orient='records', date_format='iso', force_ascii=False)
+
+
+def _listing(total, offset, limit, results_json):
+    return f'{{"total": {total}, "offset": {offset}, "limit": {limit}, "results": {results_json}}}'
+
+
+class PracticeApi:
+    """Routes API requests to JSON bodies.
+
+    ``dataset_source`` returns the current PreparedDataset; every request
+    reads one version from it, so a reload never mixes old and new rows in a
+    response. Responses are kept in an LRU keyed by the request and the
+    dataset version (and the practice's revision for organisations).
+    """
+
+    def __init__(self, dataset_source, org_store, cache_entries=RESPONSE_CACHE_ENTRIES):
+        self.dataset_source = dataset_source
+        self.org_store = org_store
+        self.cache_entries = cache_entries
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def handle(self, target):
+        """(status, JSON body bytes, ETag) for a request target such as ``/api/search?q=al``."""
+        url = urllib.parse.urlsplit(target)
+        path = [urllib.parse.unquote(part) for part in url.path.strip('/').split('/')]
+        query = urllib.parse.parse_qs(url.query)
+        try:
+            try:
+                dataset = self.dataset_source()
+            except Exception as e:
+                raise ApiError(503, f"Practice data unavailable: {e}") from None
+            key = (dataset.version, tuple(path), tuple(sorted((name, tuple(values)) for name, values in query.items())))
+            if path[:2] == ['api', 'practices'] and len(path) == 4 and path[3] == 'organization':
+                key += (self.org_store.revision(path[2]),)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    return cached
+            response = (200, self._route(dataset, path, query).encode())
+        except ApiError as e:
+            return self._error(e.status, str(e))
+        except Exception as e:
+            return self._error(500, f"{type(e).__name__}: {e}")
+
+        response += (f'"{hashlib.sha1(response[1]).hexdigest()}"',)
+        with self._lock:
+            self._cache[key] = response
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+        return response
+
+    @staticmethod
+    def _error(status, message):
+        body = json.dumps({'error': message}).encode()
+        return status, body, None
+
+    def _route(self, dataset, path, query):
+        if path[0] != 'api' or len(path) < 2:
+            raise ApiError(404, 'Unknown endpoint')
+        endpoint = path[1]
+        if endpoint == 'practices' and len(path) == 2:
+            return self._practice_names(dataset, query)
+        if endpoint == 'practices' and len(path) == 3:
+            return self._practice(dataset, path[2])
+        if endpoint == 'practices' and len(path) == 4 and path[3] == 'organization':
+            return self._organization(dataset, path[2])
+        if endpoint == 'search' and len(path) == 2:
+            return self._search(dataset, query)
+        if endpoint == 'filter' and len(path) == 2:
+            return self._filter(dataset, query)
+        if endpoint == 'nearby' and len(path) == 2:
+            return self._nearby(dataset, query)
+        raise ApiError(404, 'Unknown endpoint')
+
+    def _position(self, dataset, name):
+        rows = dataset.rows_by_name.get(name)
+        if rows is None:
+            raise ApiError(404, f"No practice named {name!r}")
+        return rows[0]
+
+    def _practice_names(self, dataset, query):
+        offset, limit = _page(query)
+        names = list(dataset.rows_by_name)
+        return _listing(len(names), offset, limit, json.dumps(names[offset:offset + limit], ensure_ascii=False))
+
+    def _practice(self, dataset, name):
+        position = self._position(dataset, name)
+        return _records(dataset.df.iloc[position:position + 1])[1:-1]
+
+    def _organization(self, dataset, name):
+        self._position(dataset, name)
+        return json.dumps({'practice': name, 'organization': self.org_store.get(name)}, ensure_ascii=False)
+
+    def _search(self, dataset, query):
+        prefix = _param(query, 'q', '')
+        if not prefix:
+            raise ApiError(400, 'q is required')
+        offset, limit = _page(query)
+        names = dataset.prefix_index.search(prefix)
+        return _listing(len(names), offset, limit, json.dumps(names[offset:offset + limit], ensure_ascii=False))
+
+    def _filter(self, dataset, query):
+        terms = [term for term in query.get('term', []) if term]
+        if not terms:
+            raise ApiError(400, 'at least one term is required')
+        df = dataset.df
+        columns = query.get('column', [])
+        fields = query.get('field', []) or list(df.columns)
+        unknown = [column for column in columns + fields if column not in df.columns]
+        if unknown:
+            raise ApiError(400, f"Unknown columns: {', '.join(unknown)}")
+        offset, limit = _page(query)
+        positions = dataset.text_index.mask(terms, columns).nonzero()[0]
+        page = df.iloc[positions[offset:offset + limit]][fields]
+        return _listing(len(positions), offset, limit, _records(page))
+
+    def _nearby(self, dataset, query):
+        offset, limit = _page(query)
+        exclude = ()
+        name = _param(query, 'practice')
+        if name is not None:
+            position = self._position(dataset, name)
+            latitude, longitude = dataset.df.iloc[position][['Latitude', 'Longitude']]
+            exclude = (position,)
+        else:
+            latitude = _number(query, 'lat', None, float, -90, 90)
+            longitude = _number(query, 'lon', None, float, -180, 180)
+            if latitude is None or longitude is None:
+                raise ApiError(400, 'practice, or lat and lon, are required')
+
+        km = _number(query, 'km', None, float, 0, 1000)
+        if km is not None:
+            hits = [hit for hit in dataset.spatial_index.within(latitude, longitude, km) if hit[0] not in exclude]
+        else:
+            hits = dataset.spatial_index.nearest(latitude, longitude, _number(query, 'n', 5, low=1, high=MAX_NEARBY),
+                                                 exclude=exclude)
+        page = hits[offset:offset + limit]
+        results = dataset.df.iloc[[position for position, _ in page]][NEARBY_FIELDS]
+        results = results.assign(**{'Distance (km)': [round(distance, 3) for _, distance in page]})
+        return _listing(len(hits), offset, limit, _records(results))
+
+
+class ApiRequestHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive lets clients reuse one connection for many requests; without
+    # TCP_NODELAY the separate header and body writes stall on delayed ACKs
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        status, body, etag = self.server.service.handle(self.path)
+        if etag is not None and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+            # Clients may reuse a response only after checking it is still current
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_api_server(api, host='127.0.0.1', port=0):
+    """Serve ``api`` from a daemon thread; see ``http_service.start_server``."""
+    return start_server(ApiRequestHandler, api, host, port, 'practice-api')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--excel', default='Coy Details.xlsx')
+    parser.add_argument('--coords', default='Practice Coords.csv')
+    parser.add_argument('--org-db', default='organization_structures.db')
+    parser.add_argument('--org-json', default='organization_structures.json')
+    args = parser.parse_args(argv)
+
+    dataset_store = DatasetStore(args.excel, args.coords)
+    dataset_store.refresh()
+    org_store = OrgStore(args.org_db)
+    org_store.sync_json(args.org_json)
+
+    server = ServiceServer((args.host, args.port), ApiRequestHandler, PracticeApi(dataset_store.refresh, org_store))
+    print(f'Serving the practice API on http://{args.host}:{args.port}/api/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Content-addressed HTTP server for generated documents such as maps and org charts.
+
+Artifacts are kept by the SHA-256 of their contents and served at
+``/assets/<hash>/<file name>``. A hash always names the same bytes, so
+responses are marked immutable and browsers revalidating with
+If-None-Match get a 304 even after the artifact has been evicted.
+"""
+import collections
+import hashlib
+import http.server
+import threading
+import urllib.parse
+
+from http_service import start_server
+
+ASSET_STORE_BYTES = 256 * 1024 * 1024
+
+# Content-addressed responses never change, so browsers may keep them for a year
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+class AssetStore:
+    """Bounded store of artifacts, evicting the least recently published first."""
+
+    def __init__(self, max_bytes=ASSET_STORE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Hash -> (data, content type), oldest first
+        self._assets = collections.OrderedDict()
+        self._bytes = 0
+
+    def __len__(self):
+        return len(self._assets)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def put(self, data, content_type):
+        """Store ``data`` (bytes or text) and return its hash, or None if it is too large to keep.
+
+        Publishing the same bytes again only marks them as recently used.
+        """
+        if isinstance(data, str):
+            data = data.encode()
+        if len(data) > self.max_bytes:
+            return None
+        key = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if key in self._assets:
+                self._assets.move_to_end(key)
+                return key
+            self._assets[key] = (data, content_type)
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._assets.popitem(last=False)
+                self._bytes -= len(evicted)
+        return key
+
+    def get(self, key):
+        """(data, content type) for ``key``, or None."""
+        with self._lock:
+            return self._assets.get(key)
+
+
+class AssetRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers ``GET /assets/<hash>/<file name>`` from the server's AssetStore."""
+
+    def do_GET(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) != 3 or parts[0] != 'assets':
+            self.send_error(404)
+            return
+        key = parts[1]
+        etag = f'"{key}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self._cache_headers(etag)
+            self.end_headers()
+            return
+        asset = self.server.service.get(key)
+        if asset is None:
+            self.send_error(404)
+            return
+
+        data, content_type = asset
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self._cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', ASSET_CACHE_CONTROL)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_asset_server(store, host='127.0.0.1', port=0):
+    """Serve ``store`` from a daemon thread; see ``http_service.start_server``."""
+    return start_server(AssetRequestHandler, store, host, port, 'asset-server')
+
+
+def asset_path(key, file_name):
+    """URL path of a published artifact, relative to the server root."""
+    return f"/assets/{key}/{urllib.parse.quote(file_name)}"
@@ -0,0 +1,149 @@
+"""Headless benchmarks for the data pipeline at growing portfolio sizes.
+
+Each stage runs once untraced for wall-clock time and once under tracemalloc
+for peak memory. The size of the prepared frame is reported before and after
+compaction. Run from the repository root:
+
+    python benchmarks/run.py [--sizes 1000 10000 100000] [--json results.json]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from data_prep import (Acquisitions, DatasetStore, compact_practices, format_website, memory_report,  # noqa: E402
+                       prepare_practices, project_report, read_excel_cached, select_practices, shorten_practice_name)
+from search_index import FuzzyMatcher, PrefixIndex, TextSearchIndex  # noqa: E402
+from spatial_index import GridIndex  # noqa: E402
+from synthetic import make_coords, make_practices  # noqa: E402
+
+
+def measure(func, memory=True):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        del result
+        tracemalloc.start()
+        try:
+            result = func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def benchmark_size(n, workdir, excel_max, memory, footprints):
+    results = []
+
+    def run(stage, func, memory=memory):
+        result, seconds, peak = measure(func, memory)
+        results.append({'practices': n, 'stage': stage, 'seconds': seconds, 'peak_bytes': peak})
+        return result
+
+    practices = make_practices(n, seed=n)
+    coords = make_coords(practices, seed=n)
+
+    coords_path = os.path.join(workdir, f'coords_{n}.csv')
+    coords.to_csv(coords_path, index=False)
+    run('load coords csv', lambda: pd.read_csv(coords_path))
+
+    if n <= excel_max:
+        excel_path = os.path.join(workdir, f'practices_{n}.xlsx')
+        practices.to_excel(excel_path, index=False, engine='xlsxwriter')
+        cache_dir = os.path.join(workdir, 'cache')
+        run('load excel (openpyxl)', lambda: pd.read_excel(excel_path))
+        read_excel_cached(excel_path, cache_dir=cache_dir)
+        run('load excel (columnar cache)', lambda: read_excel_cached(excel_path, cache_dir=cache_dir))
+        run('load excel (cache, 4 columns)', lambda: read_excel_cached(
+            excel_path, columns=['Practice Name', 'Post Code', 'Country', 'Acquisition date'], cache_dir=cache_dir))
+
+        # Reload after moving 1% of the practices; the store only rebuilds their rows
+        store = DatasetStore(excel_path, coords_path, cache_dir=cache_dir)
+        run('dataset store initial load', store.refresh, memory=False)
+        moved = coords.copy()
+        moved.loc[moved.sample(frac=0.01, random_state=n).index, 'Latitude'] += 0.01
+        moved.to_csv(coords_path, index=False)
+        run('dataset store reload (1% changed)', store.refresh, memory=False)
+        coords.to_csv(coords_path, index=False)
+
+    run('format_website', lambda: practices['Website'].apply(format_website))
+    named = practices.dropna(subset=['Practice Name'])
+    run('shorten_practice_name', lambda: named['Practice Name'].apply(shorten_practice_name))
+    plain = run('prepare dataset (incl. coords merge)', lambda: prepare_practices(practices, coords))
+    # The remaining stages use the compact frame, as the app does
+    df = run('compact dataset', lambda: compact_practices(plain))
+    footprints.append({'practices': n, 'plain MiB': memory_report(plain)['Bytes'].sum() / 2 ** 20,
+                       'compact MiB': memory_report(df)['Bytes'].sum() / 2 ** 20})
+    del plain
+
+    prefix_index = run('prefix index build', lambda: PrefixIndex(df['Practice Name']))
+    run('prefix search x100', lambda: [prefix_index.search(prefix) for prefix in ['a', 'al', 'opt', 'jo', 'sh'] * 20])
+
+    text_index = run('text index build', lambda: TextSearchIndex(df))
+    run('criteria filter (2 terms)', lambda: df[text_index.mask(['paul', 'england'])])
+    run('criteria filter (1 column)', lambda: df[text_index.mask(['paul'], ['Primary Buddy'])])
+
+    rng = np.random.default_rng(n)
+    sample = df['Practice Name'].sample(min(1000, len(df)), random_state=n).tolist()
+    # Half the names are typed with a word missing, as in "Alan Miller - Irlam"
+    typed = []
+    for name in sample:
+        words = name.split()
+        if rng.random() < 0.5 and len(words) > 2:
+            del words[rng.integers(1, len(words) - 1)]
+        typed.append(' '.join(words))
+    matcher = run('fuzzy matcher build', lambda: FuzzyMatcher(df['Practice Name']))
+    matches = run('fuzzy match 1000 names', lambda: matcher.match(typed))
+    selection = run('select matched practices', lambda: select_practices(df, matches['Matched Practice'].dropna()))
+    run('report projection', lambda: project_report(df, ['Practice Name', 'Acquisition date', 'Country'], selection))
+
+    acquisitions = run('acquisitions cube build', lambda: Acquisitions(df))
+    run('acquisitions by month (all years)', lambda: [acquisitions.by_month(year) for year in acquisitions.years])
+
+    grid = run('spatial index build', lambda: GridIndex(df['Latitude'], df['Longitude']))
+    points = df[['Latitude', 'Longitude']].sample(min(100, len(df)), random_state=n).to_numpy()
+    run('nearest 5 x100', lambda: [grid.nearest(lat, lon, 5) for lat, lon in points])
+    run('within 25 km x100', lambda: [grid.within(lat, lon, 25) for lat, lon in points])
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--excel-max', type=int, default=10000,
+                        help='skip the Excel load stages above this size; writing large test workbooks is slow')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    results, footprints = [], []
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            results.extend(benchmark_size(n, workdir, args.excel_max, not args.no_memory, footprints))
+
+    table = pd.DataFrame(results)
+    table['ms'] = (table['seconds'] * 1000).round(2)
+    table['peak MiB'] = (table['peak_bytes'] / 2 ** 20).round(2)
+    print(table.pivot_table(index='stage', columns='practices', values=['ms', 'peak MiB'], sort=False).to_string())
+    print()
+    print('Prepared frame memory')
+    print(pd.DataFrame(footprints).set_index('practices').round(2).to_string())
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Compare the Defined Criteria Filter's old row-wise apply with TextSearchIndex.
+
+Run from the repository root: python benchmarks/search_filter.py
+"""
+import os
+import sys
+import timeit
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_prep import prepare_practices, read_excel_cached  # noqa: E402
+from search_index import TextSearchIndex  # noqa: E402
+
+TERMS = ['paul', 'england']
+
+
+def apply_search(df, terms):
+    def multiple_search(row):
+        return all(term.lower() in str(row).lower() for term in terms if term)
+    return df[df.apply(multiple_search, axis=1)]
+
+
+def main():
+    df = prepare_practices(read_excel_cached('Coy Details.xlsx'), pd.read_csv('Practice Coords.csv'))
+    build = timeit.timeit(lambda: TextSearchIndex(df), number=3) / 3
+    index = TextSearchIndex(df)
+
+    runs = 5
+    apply_time = timeit.timeit(lambda: apply_search(df, TERMS), number=runs) / runs
+    index_time = timeit.timeit(lambda: df[index.mask(TERMS)], number=runs) / runs
+
+    print(f"rows: {len(df)}, terms: {TERMS}")
+    print(f"index build:   {build * 1000:8.2f} ms (once per dataset version)")
+    print(f"apply search:  {apply_time * 1000:8.2f} ms")
+    print(f"index search:  {index_time * 1000:8.2f} ms")
+    print(f"speedup:       {apply_time / index_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Synthetic practice portfolios shaped like Coy Details.xlsx and Practice Coords.csv."""
+import numpy as np
+import pandas as pd
+
+COY_COLUMNS = [
+    'Practice Name', 'Legal Entity', 'Company No', 'VAT Number', 'Acquisition date', 'Unnamed: 5', 'Address',
+    'Post Code', 'Country', 'Telephone No', 'Website', 'Practice email', 'Unnamed: 12', 'Hakim Group Shares (%)',
+    *[f'Shark {i} ({field})' for i in range(1, 7) for field in ('name', 'email address', 'shareholding - %')],
+    'Shareholding % check (100)', 'Unnamed: 33',
+    *[f'Fish {i} ({field})' for i in range(1, 6) for field in ('name', 'email')],
+    'Unnamed: 44', 'Primary Buddy', 'Secondary Buddy', 'Senior Buddy', 'Unnamed: 48', 'ID', 'Email',
+]
+
+SURNAMES = ['Aaron', 'Adlam', 'Baker', 'Carroll', 'Dawson', 'Evans', 'Frampton', 'Gage', 'Hughes', 'Irwin', 'Jones',
+            'Kobrin', 'Lloyd', 'Mason', 'Nolan', 'Owens', 'Patel', 'Quinn', 'Robinson', 'Shah', 'Taylor', 'Walsh']
+FIRST_NAMES = ['Alan', 'Alex', 'Amar', 'Claire', 'Dawn', 'Heidi', 'Jamie', 'John', 'Nichola', 'Paul', 'Peter', 'Sara']
+SUFFIXES = ['Opticians', 'Optometrists', 'Eyecare', 'Visioncare', 'Eye Clinic']
+TOWNS = ['Ashington', 'Bristol', 'Cardiff', 'Dundee', 'Irlam', 'Leeds', 'Limerick', 'Sheffield', 'Sligo', 'Walkden']
+COUNTRIES = ['England', 'Scotland', 'Wales', 'Ireland', 'Northern Ireland', 'Isle of Man', 'Jersey', 'Guernsey']
+COUNTRY_WEIGHTS = [0.74, 0.12, 0.06, 0.045, 0.02, 0.01, 0.0035, 0.0015]
+BUDDIES = [f'{first} {last}' for first in FIRST_NAMES[:6] for last in SURNAMES[:4]]
+
+
+def _pick(rng, values, n, p=None):
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p)]
+
+
+def _sparse(rng, values, fill_rate):
+    values = values.astype(object)
+    values[rng.random(len(values)) > fill_rate] = np.nan
+    return values
+
+
+def make_practices(n, seed=0):
+    """A frame with the Coy Details.xlsx columns and ``n`` distinct practices.
+
+    Columns keep the workbook's quirks: company numbers mix int and str,
+    acquisition dates mix datetimes, dd/mm/yyyy strings and blanks, and the
+    Shark/Fish columns get sparser with each slot.
+    """
+    rng = np.random.default_rng(seed)
+    first = _pick(rng, FIRST_NAMES, n)
+    last = _pick(rng, SURNAMES, n)
+    suffix = _pick(rng, SUFFIXES, n)
+    town = _pick(rng, TOWNS, n)
+    # One pattern per branch of shorten_practice_name; the row number keeps names unique
+    style = rng.integers(0, 3, n)
+    names = np.array([
+        f'{last[i]}{i} {suffix[i]}' if style[i] == 0
+        else f'{first[i]} {last[i]} {suffix[i]} - {town[i]}{i}' if style[i] == 1
+        else f'{last[i]} {first[i]} {suffix[i]} {i}'
+        for i in range(n)
+    ], dtype=object)
+
+    country = _pick(rng, COUNTRIES, n, p=COUNTRY_WEIGHTS)
+    outward = np.char.add(_pick(rng, ['NE', 'PE', 'M', 'S', 'BS', 'CF', 'DD', 'BT'], n).astype(str),
+                          rng.integers(1, 99, n).astype(str))
+    inward = np.char.add(rng.integers(0, 9, n).astype(str),
+                         np.char.add(_pick(rng, list('ABDEFGHJLNPQRSTUWXYZ'), n).astype(str),
+                                     _pick(rng, list('ABDEFGHJLNPQRSTUWXYZ'), n).astype(str)))
+    post_code = np.char.add(np.char.add(outward, ' '), inward).astype(object)
+    address = np.char.add(np.char.add(rng.integers(1, 400, n).astype(str), ' High Street, '), town.astype(str)).astype(object)
+
+    days = rng.integers(0, 7000, n)
+    dates = pd.Timestamp('2005-01-01') + pd.to_timedelta(days, unit='D')
+    date_kind = rng.random(n)
+    acquisition = np.empty(n, dtype=object)
+    for i in range(n):
+        if date_kind[i] < 0.03:
+            acquisition[i] = np.nan
+        elif date_kind[i] < 0.3:
+            acquisition[i] = dates[i].strftime('%d/%m/%Y')
+        else:
+            acquisition[i] = dates[i].to_pydatetime()
+
+    company = rng.integers(1_000_000, 9_999_999, n).astype(object)
+    as_text = rng.random(n) < 0.2
+    company[as_text] = ['0' + str(value) for value in company[as_text]]
+
+    domain = np.char.add(np.char.lower(last.astype(str)), np.char.add(rng.integers(0, n, n).astype(str), '.co.uk'))
+    data = {
+        'Practice Name': names,
+        'Legal Entity': (names + ' Limited').astype(object),
+        'Company No': company,
+        'VAT Number': rng.integers(100_000_000, 999_999_999, n).astype(object),
+        'Acquisition date': acquisition,
+        'Address': address,
+        'Post Code': post_code,
+        'Country': country,
+        'Telephone No': np.char.add('01', rng.integers(100_000_000, 999_999_999, n).astype(str)).astype(object),
+        'Website': np.where(rng.random(n) < 0.5, np.char.add('https://www.', domain), domain).astype(object),
+        'Practice email': np.char.add('admin@', domain).astype(object),
+        'Hakim Group Shares (%)': _pick(rng, [50, 60, 100, '50.1', 49.9], n),
+        'Shareholding % check (100)': np.full(n, 100.0),
+        'Primary Buddy': _sparse(rng, _pick(rng, BUDDIES, n), 0.95),
+        'Secondary Buddy': _sparse(rng, _pick(rng, BUDDIES, n), 0.3),
+        'Senior Buddy': _sparse(rng, _pick(rng, BUDDIES[:3], n), 0.9),
+        'ID': rng.integers(1, 10 * n, n).astype(object),
+        'Email': _sparse(rng, np.char.add('admin@', domain).astype(object), 0.3),
+    }
+    for i in range(1, 7):
+        fill = max(0.9 - 0.2 * (i - 1), 0.02)
+        person = _sparse(rng, (_pick(rng, FIRST_NAMES, n) + ' ' + _pick(rng, SURNAMES, n)), fill)
+        data[f'Shark {i} (name)'] = person
+        data[f'Shark {i} (email address)'] = np.where(pd.isna(person), np.nan, 'shark@hakimgroup.co.uk')
+        data[f'Shark {i} (shareholding - %)'] = np.where(pd.isna(person), np.nan, rng.integers(1, 50, n).astype(float))
+    for i in range(1, 6):
+        fill = max(0.8 - 0.25 * (i - 1), 0.0)
+        person = _sparse(rng, (_pick(rng, FIRST_NAMES, n) + ' ' + _pick(rng, SURNAMES, n)), fill)
+        data[f'Fish {i} (name)'] = person
+        data[f'Fish {i} (email)'] = np.where(pd.isna(person), np.nan, 'fish@hakimgroup.co.uk')
+
+    df = pd.DataFrame({column: data.get(column, np.full(n, np.nan)) for column in COY_COLUMNS})
+    # Blank rows at the end of the sheet, as Excel exports often have
+    return pd.concat([df, pd.DataFrame(np.nan, index=range(max(n // 100, 1)), columns=COY_COLUMNS)], ignore_index=True)
+
+
+def make_coords(practices, seed=0, missing_rate=0.02):
+    """A Practice Coords.csv frame for ``practices``, leaving ``missing_rate`` of them out."""
+    rng = np.random.default_rng(seed)
+    practices = practices.dropna(subset=['Practice Name'])
+    keep = rng.random(len(practices)) >= missing_rate
+    rows = practices[keep]
+    return pd.DataFrame({
+        'Practice Name': rows['Practice Name'].to_numpy(),
+        'Post Code': rows['Post Code'].to_numpy(),
+        'Full Address': (rows['Address'] + ', ' + rows['Post Code']).to_numpy(),
+        'Latitude': rng.uniform(50.0, 58.5, len(rows)),
+        'Longitude': rng.uniform(-8.0, 1.5, len(rows)),
+    })
@@ -0,0 +1,768 @@
+import concurrent.futures
+import functools
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from perf import recorder
+from search_index import FuzzyMatcher, PrefixIndex, TextSearchIndex, normalize_text
+from spatial_index import GridIndex
+
+# Coordinates for Dublin, used when a practice has no match in the coords CSV
+FALLBACK_COORDINATES = (53.3498, -6.2603)
+
+# Placeholder stored for practices without an acquisition date
+NO_ACQUISITION_DATE = pd.Timestamp('1900-01-01')
+
+REQUIRED_COORD_COLUMNS = ['Practice Name', 'Post Code', 'Full Address', 'Latitude', 'Longitude']
+MERGE_KEYS = ['Practice Name', 'Post Code', 'Full Address']
+
+# Text columns with at most this share of distinct values among their filled cells become categoricals
+CATEGORY_MAX_DISTINCT = 0.5
+
+# Sidecar cache for parsed workbooks; bump the schema version when the layout changes
+CACHE_DIR = '.cache'
+CACHE_SCHEMA_VERSION = 1
+
+
+@functools.lru_cache(maxsize=32)
+def _hash_file(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path):
+    """Content hash of ``path``, recomputed only when its mtime or size changes."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ''
+    return _hash_file(path, stat.st_mtime_ns, stat.st_size)
+
+
+def _cache_path(path, version, cache_dir):
+    return os.path.join(cache_dir, f"{os.path.basename(path)}-{version[:16]}")
+
+
+def _read_manifest(target):
+    try:
+        with open(os.path.join(target, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('schema_version') != CACHE_SCHEMA_VERSION:
+        return None
+    return manifest
+
+
+def _write_columnar_cache(df, path, version, target):
+    # Columns are stored as separate pickles so mixed-type Excel columns keep
+    # their exact values and readers can load only the columns they need.
+    cache_dir = os.path.dirname(target)
+    os.makedirs(cache_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=cache_dir)
+    try:
+        columns = []
+        for i, column in enumerate(df.columns):
+            file_name = f"{i:04d}.pkl"
+            with open(os.path.join(staging, file_name), 'wb') as f:
+                pickle.dump(df[column], f, protocol=pickle.HIGHEST_PROTOCOL)
+            columns.append({'name': column, 'file': file_name})
+        with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+            json.dump({'schema_version': CACHE_SCHEMA_VERSION, 'source': os.path.basename(path),
+                       'source_sha256': version, 'columns': columns}, f)
+        try:
+            os.rename(staging, target)
+        except OSError:
+            # Another process finished the same version first
+            shutil.rmtree(staging, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Drop caches left behind by earlier versions of the workbook
+    prefix = f"{os.path.basename(path)}-"
+    for entry in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, entry)
+        if entry.startswith(prefix) and stale != target:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _read_columnar_cache(target, manifest, columns):
+    entries = {entry['name']: entry['file'] for entry in manifest['columns']}
+    if columns is None:
+        columns = [entry['name'] for entry in manifest['columns']]
+    data = {}
+    for column in columns:
+        with open(os.path.join(target, entries[column]), 'rb') as f:
+            data[column] = pickle.load(f)
+    return pd.DataFrame(data, columns=columns)
+
+
+def read_excel_cached(path, columns=None, cache_dir=CACHE_DIR):
+    """Read an Excel workbook through a columnar sidecar cache.
+
+    The workbook is parsed once per content hash; later reads load only the
+    requested ``columns`` from the cache. Raises KeyError for unknown columns.
+    """
+    version = file_version(path)
+    target = _cache_path(path, version, cache_dir)
+    manifest = _read_manifest(target) if version else None
+    if manifest is not None:
+        return _read_columnar_cache(target, manifest, columns)
+
+    df = pd.read_excel(path)
+    try:
+        _write_columnar_cache(df, path, version, target)
+    except OSError:
+        # A read-only filesystem only costs us the cache
+        pass
+    return df if columns is None else df[columns]
+
+
+# Function to format website links
+def format_website(url):
+    if pd.isna(url):
+        return ''
+    if not url.startswith(('http://', 'https://')):
+        return 'http://' + url
+    return url
+
+
+# Function to shorten practice names
+def shorten_practice_name(name):
+    parts = name.split()
+    if len(parts) == 2:
+        return f"{parts[0]} {parts[1]}"
+    elif '-' in name:
+        hyphen_index = parts.index('-')
+        return f"{parts[0]} {parts[hyphen_index + 1]}"
+    return parts[0]
+
+
+def build_full_address(df):
+    # Concatenate 'Address' and 'Post Code' to form the complete address
+    return df['Address'] + ', ' + df['Post Code']
+
+
+def missing_coord_columns(coords_df):
+    return [col for col in REQUIRED_COORD_COLUMNS if col not in coords_df.columns]
+
+
+def prepare_practices(df, coords_df):
+    """Build the enriched practice frame from the raw Excel and coords frames.
+
+    The inputs are not modified. Raises if the coordinates cannot be merged.
+    """
+    # Ensure all rows are included by checking for missing data; a copy, since the
+    # columns below are written in place
+    df = df.dropna(how='all').copy()
+
+    # Format the website links
+    df['Website'] = df['Website'].apply(format_website)
+
+    df['Full Address'] = build_full_address(df)
+
+    # Parse the acquisition date, replacing missing or invalid dates with the placeholder
+    df['Acquisition date'] = pd.to_datetime(df['Acquisition date'], errors='coerce').fillna(NO_ACQUISITION_DATE)
+
+    # Merge coordinates with the main dataframe
+    df = df.merge(coords_df, on=MERGE_KEYS, how='left')
+
+    # Handle any remaining missing coordinates with fallback coordinates
+    df['Latitude'] = df['Latitude'].fillna(FALLBACK_COORDINATES[0])
+    df['Longitude'] = df['Longitude'].fillna(FALLBACK_COORDINATES[1])
+
+    # Shorten practice names for visualization
+    df['Short Practice Name'] = df['Practice Name'].apply(shorten_practice_name)
+    return df
+
+
+def select_practices(df, names):
+    """Positions of the rows of ``df`` whose Practice Name is in ``names``."""
+    return np.flatnonzero(df['Practice Name'].isin(names).to_numpy())
+
+
+def project_report(df, columns, positions=None):
+    """``columns`` of the rows of ``df`` at ``positions`` (all rows by default),
+    with datetime columns formatted as YYYY-MM-DD text.
+
+    Only the requested columns of the requested rows are copied.
+    """
+    if positions is None:
+        report = df[columns]
+    else:
+        report = df.iloc[positions, df.columns.get_indexer(columns)]
+    # Remove trailing zeros in date columns
+    dates = report.select_dtypes(include=['datetime64[ns]']).columns
+    if len(dates):
+        report = report.assign(**{col: report[col].dt.strftime('%Y-%m-%d') for col in dates})
+    return report
+
+
+def _compact_column(series):
+    if series.dtype == object:
+        kind = pd.api.types.infer_dtype(series, skipna=True)
+        if kind == 'string':
+            if series.nunique() <= CATEGORY_MAX_DISTINCT * series.count():
+                return series.astype('category')
+            if pyarrow is not None:
+                return series.astype(pd.StringDtype('pyarrow'))
+        elif kind == 'integer' and series.notna().all():
+            return pd.to_numeric(series, downcast='integer')
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        return pd.to_numeric(series, downcast='integer')
+    elif series.dtype == np.float64:
+        narrow = series.astype(np.float32)
+        # Only when every value survives the round trip; coordinates keep full precision
+        if np.array_equal(narrow.to_numpy(np.float64), series.to_numpy(), equal_nan=True):
+            return narrow
+    return series
+
+
+def compact_practices(df):
+    """``df`` with its columns stored in the smallest dtype that keeps every value.
+
+    Text columns with few distinct values, such as Country and the buddies,
+    become categoricals and other text columns Arrow-backed strings (when
+    pyarrow is installed). Integer columns and floats that fit exactly in
+    float32 are downcast. Columns mixing numbers and text, such as Company
+    No, stay as objects.
+    """
+    compacted = {}
+    for column in df.columns:
+        series = df[column]
+        compact = _compact_column(series)
+        if compact is not series:
+            compacted[column] = compact
+    return df.assign(**compacted) if compacted else df
+
+
+def memory_report(df):
+    """Frame of Column, Dtype and Bytes for ``df``, largest first.
+
+    Bytes include the contents of strings and categories, not just the
+    pointers to them, so the total is what a process keeps for the frame.
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({'Column': usage.index, 'Dtype': df.dtypes.astype(str).to_numpy(), 'Bytes': usage.to_numpy()})
+    return report.sort_values('Bytes', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def column_version(df, columns):
+    """Content hash of ``columns`` of ``df``, for keying indexes that depend only on them."""
+    hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+def _hash_rows(df):
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _occurrences(values):
+    """For each value, how many times it appears before that position."""
+    order = np.argsort(values, kind='stable')
+    _, starts, counts = np.unique(values[order], return_index=True, return_counts=True)
+    occurrences = np.empty(len(values), dtype=np.intp)
+    occurrences[order] = np.arange(len(values)) - np.repeat(starts, counts)
+    return occurrences
+
+
+def _ranges(starts, counts):
+    """``starts[i]``, ``starts[i] + 1``, ... for ``counts[i]`` values each, concatenated."""
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+
+def _row_fingerprints(raw, coords_df):
+    """One uint64 fingerprint per raw workbook row.
+
+    It covers the row's own cells and, in file order, every coords row it
+    merges with, so a practice is recomputed when either side changes.
+    """
+    coord_keys = _hash_rows(coords_df[MERGE_KEYS])
+    coord_rows = _hash_rows(pd.DataFrame({'row': _hash_rows(coords_df), 'occurrence': _occurrences(coord_keys)}))
+    # Sum of the hashes of each key's coords rows; uint64 addition wraps
+    order = np.argsort(coord_keys, kind='stable')
+    keys, starts = np.unique(coord_keys[order], return_index=True)
+    merged = np.add.reduceat(coord_rows[order], starts) if len(keys) else coord_rows[:0]
+
+    raw_keys = _hash_rows(raw[MERGE_KEYS[:2]].assign(**{'Full Address': build_full_address(raw)}))
+    found = np.minimum(np.searchsorted(keys, raw_keys), max(len(keys) - 1, 0))
+    matched = keys[found] == raw_keys if len(keys) else np.zeros(len(raw_keys), dtype=bool)
+    coords = np.where(matched, merged[found] if len(keys) else 0, np.uint64(0))
+    return _hash_rows(pd.DataFrame({'row': _hash_rows(raw), 'coords': coords.astype(np.uint64)}))
+
+
+def _same_values(fitted, values):
+    missing = values.isna().to_numpy()
+    if not np.array_equal(fitted.isna().to_numpy(), missing):
+        return False
+    return bool((fitted.to_numpy(dtype=object)[~missing] == values.to_numpy(dtype=object)[~missing]).all())
+
+
+def _patch_column(series, positions, values):
+    """``series`` with ``values`` written at ``positions``, keeping its compact dtype if every value fits."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Categories of removed rows would otherwise build up over reloads
+        series = series.cat.remove_unused_categories()
+    if not len(positions):
+        return series
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        new = values[values.notna() & ~values.isin(series.cat.categories)].unique()
+        if len(new):
+            series = series.cat.add_categories(new)
+    try:
+        fitted = values.astype(series.dtype)
+    except (TypeError, ValueError):
+        fitted = None
+    if fitted is not None and _same_values(fitted, values):
+        series.iloc[positions] = fitted.array
+        return series
+    # Widen to the dtype prepare_practices produces and compact the column again
+    widened = series.astype(values.dtype)
+    widened.iloc[positions] = values.to_numpy()
+    return _compact_column(widened)
+
+
+def _patch_rows(df, previous_rows, fresh):
+    """The rows of the compacted ``df`` at ``previous_rows``, with the rows marked -1 filled from ``fresh`` in order.
+
+    Only the fresh values are converted; columns change dtype only where a
+    fresh value does not fit the compact one.
+    """
+    take = np.maximum(previous_rows, 0)
+    positions = np.flatnonzero(previous_rows < 0)
+    fresh = fresh.reset_index(drop=True)
+    return pd.DataFrame({
+        column: _patch_column(pd.Series(df[column].array.take(take), name=column), positions, fresh[column])
+        for column in df.columns
+    })
+
+
+class PreparedDataset:
+    """One immutable version of the prepared practice data and its indexes.
+
+    ``version`` is the pair of source file hashes. ``names_version`` and
+    ``coords_version`` hash only the practice names and coordinates, so
+    indexes built from those survive reloads that leave them unchanged.
+    Indexes are built once, by whichever thread asks first, and are shared by
+    every reader of this version; a build that raises is retried by the next
+    reader. The text index may still be building in the background, and
+    reading ``text_index`` waits for it. Builds are timed as stages of the
+    reading thread's perf run, or of ``run`` when built in the background.
+    """
+
+    # Perf stage name of each index build
+    STAGES = {
+        'text': 'build text index', 'prefix': 'build prefix index', 'fuzzy': 'build fuzzy matcher',
+        'spatial': 'build spatial index', 'rows_by_name': 'build rows by name',
+        'acquisitions': 'build acquisitions cube', 'people': 'build people table',
+    }
+
+    def __init__(self, version, df, text_index, fingerprints, source_starts, source_dtypes, previous_rows,
+                 run=None):
+        self.version = version
+        self.df = df
+        self._text_index = text_index
+        self.names_version = column_version(df, ['Practice Name'])
+        self.coords_version = column_version(df, ['Latitude', 'Longitude'])
+        # Position of each row in the previous version, -1 where it had to be recomputed
+        self.previous_rows = previous_rows
+        self.changed_rows = int((previous_rows < 0).sum())
+        # Workbook rows by fingerprint and occurrence, so identical rows pair up one to one
+        self._sources = pd.MultiIndex.from_arrays([fingerprints, _occurrences(fingerprints)])
+        # Prepared rows of workbook row i are source_starts[i]:source_starts[i + 1]
+        self._source_starts = source_starts
+        self._source_dtypes = source_dtypes
+        self._lock = threading.Lock()
+        # Index name -> Future, set once the index is built
+        self._indexes = {}
+        # Derived tables of the previous version, updated rather than rebuilt
+        self._previous_tables = {}
+        self._run = run
+
+    def _index(self, name, build):
+        with self._lock:
+            future = self._indexes.get(name)
+            # A failed build is tried again by the next reader rather than kept
+            building = future is None or future.done() and future.exception() is not None
+            if building:
+                future = self._indexes[name] = concurrent.futures.Future()
+        if building:
+            try:
+                with recorder.stage(self.STAGES.get(name, f'build {name}'), recorder.current_run() or self._run):
+                    future.set_result(build())
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+        return future.result()
+
+    def _adopt_indexes(self, previous):
+        # Indexes over columns that did not change carry over from the previous version
+        unchanged = {
+            'prefix': self.names_version == previous.names_version,
+            'fuzzy': self.names_version == previous.names_version,
+            'spatial': self.coords_version == previous.coords_version,
+        }
+        with previous._lock:
+            for name, future in previous._indexes.items():
+                if unchanged.get(name):
+                    self._indexes[name] = future
+                elif name in ('acquisitions', 'people') and future.done() and future.exception() is None:
+                    self._previous_tables[name] = future.result()
+
+    def _table(self, name, build):
+        def update():
+            previous = self._previous_tables.pop(name, None)
+            if previous is None:
+                return build(self.df)
+            return build(self.df, previous=previous, previous_rows=self.previous_rows)
+        return self._index(name, update)
+
+    @property
+    def text_index(self):
+        if self._text_index.done() and self._text_index.exception() is not None:
+            return self._index('text', lambda: TextSearchIndex(self.df))
+        return self._text_index.result()
+
+    @property
+    def prefix_index(self):
+        return self._index('prefix', lambda: PrefixIndex(self.df['Practice Name']))
+
+    @property
+    def fuzzy_matcher(self):
+        return self._index('fuzzy', lambda: FuzzyMatcher(self.df['Practice Name']))
+
+    @property
+    def spatial_index(self):
+        return self._index('spatial', lambda: GridIndex(self.df['Latitude'], self.df['Longitude']))
+
+    @property
+    def acquisitions(self):
+        return self._table('acquisitions', Acquisitions)
+
+    @property
+    def people(self):
+        return self._table('people', People)
+
+    @property
+    def rows_by_name(self):
+        """Positions of each practice's rows, by Practice Name."""
+        return self._index('rows_by_name', lambda: self.df.groupby('Practice Name', sort=False).indices)
+
+
+class DatasetStore:
+    """The current PreparedDataset for a workbook and coords CSV, shared by every session.
+
+    ``refresh`` checks the source files (a stat per file while they are
+    unchanged) and, when either has changed, builds the next version from the
+    previous one: workbook rows are matched by a fingerprint of their cells
+    and coordinates, unchanged practices keep their prepared rows, search
+    text, acquisitions and people rows, and only new or edited practices go
+    through ``prepare_practices``. The prepared frame is kept in compact dtypes
+    (see ``compact_practices``); on a reload the fresh rows are converted and
+    patched in, so unchanged columns are not compacted again.
+    The new version replaces ``current`` in a single assignment, so readers
+    see either the old or the new dataset, never a mix. While one thread
+    rebuilds, other callers keep getting the previous version.
+
+    The workbook and coords CSV are read at the same time on a small thread
+    pool, and the text index, fuzzy matcher, spatial index, acquisitions and
+    people tables are built there after the prepared frame is returned, so
+    callers can start using the data before search is ready.
+    """
+
+    def __init__(self, excel_path, coords_path, cache_dir=CACHE_DIR):
+        self.excel_path = excel_path
+        self.coords_path = coords_path
+        self.cache_dir = cache_dir
+        self.current = None
+        self._lock = threading.Lock()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='dataset')
+
+    def refresh(self):
+        """The current PreparedDataset, rebuilt first if the source files changed.
+
+        Raises if the files cannot be read or merged; ``current`` is left as it was.
+        """
+        version = (file_version(self.excel_path), file_version(self.coords_path))
+        current = self.current
+        if current is not None and current.version == version:
+            return current
+        # The first load has to wait; later ones keep serving the old version
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            if self.current is None or self.current.version != version:
+                self.current = self._build(version, self.current)
+            return self.current
+        finally:
+            self._lock.release()
+
+    def _build(self, version, previous):
+        # Stages go to the run of the session that noticed the change
+        run = recorder.current_run() or recorder.add_run('dataset reload')
+        raw = self._pool.submit(recorder.timed('load excel', run)(read_excel_cached),
+                                self.excel_path, cache_dir=self.cache_dir)
+        coords_df = self._pool.submit(recorder.timed('load coords', run)(pd.read_csv), self.coords_path)
+        raw = raw.result().dropna(how='all').reset_index(drop=True)
+        coords_df = coords_df.result()
+        missing = missing_coord_columns(coords_df)
+        if missing:
+            raise ValueError(f"Missing column in Practice Coords CSV: {', '.join(missing)}")
+
+        # Parsed over the whole column as prepare_practices would, since the
+        # inferred date format depends on every row, not just the changed ones
+        raw['Acquisition date'] = pd.to_datetime(raw['Acquisition date'], errors='coerce')
+        with recorder.stage('fingerprint rows', run):
+            fingerprints = _row_fingerprints(raw, coords_df)
+        source_dtypes = (list(raw.dtypes.items()), list(coords_df.dtypes.items()))
+        if previous is None or previous._source_dtypes != source_dtypes:
+            # Different columns or column types; a full rebuild keeps dtypes consistent
+            old_sources = np.full(len(raw), -1)
+        else:
+            old_sources = previous._sources.get_indexer(
+                pd.MultiIndex.from_arrays([fingerprints, _occurrences(fingerprints)]))
+
+        changed = np.flatnonzero(old_sources < 0)
+        with recorder.stage('prepare dataset', run):
+            fresh = prepare_practices(raw.iloc[changed].assign(_source=changed), coords_df)
+        # Workbook order, so the fresh rows line up with the gaps _patch_rows fills
+        fresh = fresh.iloc[np.argsort(fresh['_source'].to_numpy(), kind='stable')]
+        counts = np.bincount(fresh.pop('_source').to_numpy(), minlength=len(raw))
+        reused = np.flatnonzero(old_sources >= 0)
+        old_starts = previous._source_starts[old_sources[reused]] if len(reused) else reused
+        counts[reused] = previous._source_starts[old_sources[reused] + 1] - old_starts if len(reused) else 0
+        source_starts = np.concatenate([[0], np.cumsum(counts)])
+
+        previous_rows = np.full(source_starts[-1], -1)
+        if len(reused):
+            previous_rows[_ranges(source_starts[reused], counts[reused])] = _ranges(old_starts, counts[reused])
+            with recorder.stage('patch dataset', run):
+                df = _patch_rows(previous.df, previous_rows, fresh)
+        else:
+            with recorder.stage('compact dataset', run):
+                df = compact_practices(fresh.reset_index(drop=True))
+
+        text_index = self._pool.submit(recorder.timed(PreparedDataset.STAGES['text'], run)(self._build_text_index),
+                                       df, previous if len(reused) else None, previous_rows)
+        dataset = PreparedDataset(version, df, text_index, fingerprints, source_starts, source_dtypes, previous_rows,
+                                  run)
+        if previous is not None:
+            dataset._adopt_indexes(previous)
+        for index in ('fuzzy_matcher', 'spatial_index', 'acquisitions', 'people'):
+            self._pool.submit(getattr, dataset, index)
+        return dataset
+
+    @staticmethod
+    def _build_text_index(df, previous, previous_rows):
+        if previous is None:
+            return TextSearchIndex(df)
+        return TextSearchIndex(df, previous=previous.text_index, previous_rows=previous_rows)
+
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+ACQUISITION_COLUMNS = ['Practice Name', 'Acquisition date', 'Country']
+
+
+def _updated_rows(previous, previous_rows, build):
+    """Per-row frame for the current version, reusing ``previous`` for unchanged rows.
+
+    ``previous`` has one or more rows per row of the previous version, tagged
+    with that row's position in ``_row``. ``build(rows)`` makes the same
+    frame for the given current positions.
+    """
+    positions = np.asarray(previous_rows)
+    moved = np.full(int(previous['_row'].max()) + 1 if len(previous) else 0, -1)
+    kept = np.flatnonzero(positions >= 0)
+    moved[positions[kept]] = kept
+    rows = moved[previous['_row'].to_numpy()]
+    parts = [previous[rows >= 0].assign(_row=rows[rows >= 0])]
+    fresh = np.flatnonzero(positions < 0)
+    if len(fresh):
+        parts.append(build(fresh))
+    table = pd.concat(parts, ignore_index=True)
+    return table.iloc[np.argsort(table['_row'].to_numpy(), kind='stable')].reset_index(drop=True)
+
+
+class Acquisitions:
+    """Year x month x country acquisition counts for a prepared practice frame.
+
+    Built once per dataset; the yearly and monthly views are slices of the
+    cube and the per-year practice tables are split out up front. Passing
+    the Acquisitions of an earlier version of the frame as ``previous``,
+    with ``previous_rows`` as for TextSearchIndex, reuses the formatted rows
+    of unchanged practices.
+    """
+
+    def __init__(self, df, previous=None, previous_rows=None):
+        def build(positions):
+            return self._rows_for(df.iloc[positions][ACQUISITION_COLUMNS], positions)
+
+        if previous is None:
+            self._rows = build(np.arange(len(df)))
+        else:
+            self._rows = _updated_rows(previous._rows, previous_rows, build)
+
+        rows = self._rows
+        has_date = rows['Year'] >= 0
+        valid = rows[has_date]
+        # Plain values, so a categorical Country neither rejects 'Unknown' nor adds unseen countries
+        countries = valid['Country'].fillna('Unknown')
+        self.cube = valid.groupby([valid['Year'], valid['Month'], countries]).size().rename('Count')
+        self.years = sorted(self.cube.index.get_level_values('Year').unique())
+        self.countries = sorted(self.cube.index.get_level_values('Country').unique())
+
+        self._tables = {year: table[ACQUISITION_COLUMNS].reset_index(drop=True)
+                        for year, table in valid.groupby('Year')}
+        self.no_date = rows.loc[~has_date, ACQUISITION_COLUMNS].reset_index(drop=True)
+
+    @staticmethod
+    def _rows_for(table, positions):
+        dates = table['Acquisition date']
+        has_date = (dates != NO_ACQUISITION_DATE).to_numpy()
+        return pd.DataFrame({
+            'Practice Name': table['Practice Name'].to_numpy(),
+            'Acquisition date': dates.dt.strftime('%Y-%m-%d').to_numpy(),
+            'Country': table['Country'].astype(object).to_numpy(),
+            'Year': np.where(has_date, dates.dt.year, -1),
+            'Month': np.where(has_date, dates.dt.month, -1),
+            '_row': positions,
+        })
+
+    def _slice(self, countries):
+        if countries:
+            return self.cube[self.cube.index.get_level_values('Country').isin(countries)]
+        return self.cube
+
+    def by_year(self, countries=None):
+        """Acquisitions per year, leaving out years without any."""
+        counts = self._slice(countries).groupby(level='Year').sum()
+        return counts[counts > 0]
+
+    def by_month(self, year, countries=None):
+        """Frame of Month (ordered categorical, all twelve months) and Count for ``year``."""
+        cube = self._slice(countries)
+        counts = cube[cube.index.get_level_values('Year') == year].groupby(level='Month').sum()
+        counts = counts.reindex(range(1, 13), fill_value=0)
+        return pd.DataFrame({'Month': pd.Categorical(MONTHS, categories=MONTHS, ordered=True),
+                             'Count': counts.to_numpy()})
+
+    def practices(self, year, countries=None):
+        """Practice Name, Acquisition date (as text) and Country for the practices acquired in ``year``."""
+        table = self._tables.get(year, self.no_date.iloc[0:0])
+        if countries:
+            table = table[table['Country'].fillna('Unknown').isin(countries)].reset_index(drop=True)
+        return table
+
+
+SHARK_SLOTS = range(1, 7)
+FISH_SLOTS = range(1, 6)
+BUDDY_ROLES = ['Primary Buddy', 'Secondary Buddy', 'Senior Buddy']
+PEOPLE_COLUMNS = ['Practice Name', 'Role', 'Slot', 'Person', 'Email', 'Shareholding (%)']
+
+
+def _people_slots(df):
+    # (role, slot, name column, email column, shareholding column) in display order
+    for i in SHARK_SLOTS:
+        yield 'Shark', i, f'Shark {i} (name)', f'Shark {i} (email address)', f'Shark {i} (shareholding - %)'
+    for i in FISH_SLOTS:
+        yield 'Fish', i, f'Fish {i} (name)', f'Fish {i} (email)', None
+    for role in BUDDY_ROLES:
+        yield role, None, role, None, None
+
+
+def _text_keys(series, key):
+    """``key(value)`` for every string in ``series`` and '' elsewhere, computed once per distinct value."""
+    codes, uniques = pd.factorize(series)
+    keys = np.array([key(value) if isinstance(value, str) else '' for value in uniques] + [''], dtype=object)
+    return keys[codes]
+
+
+def _positions_by(keys):
+    """``{key: positions}`` for every key other than ''."""
+    codes, uniques = pd.factorize(keys)
+    order = np.argsort(codes, kind='stable')
+    groups = np.split(order, np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))[:-1])
+    return {key: rows for key, rows in zip(uniques, groups) if key != ''}
+
+
+class People:
+    """Long-form table of the Shark, Fish and buddy columns, one row per filled slot.
+
+    Rows keep the order of the detail panel (Shark 1-6, Fish 1-5, then
+    buddies) within each practice. Lookups by practice, person name or email
+    are dictionary hits on positions into ``table``. ``previous`` and
+    ``previous_rows`` reuse the rows and lookup keys of unchanged practices,
+    as for Acquisitions.
+    """
+
+    def __init__(self, df, previous=None, previous_rows=None):
+        def build(positions):
+            table = self._rows_for(df.iloc[positions], positions)
+            return table.assign(_person=_text_keys(table['Person'], normalize_text),
+                                _email=_text_keys(table['Email'], lambda v: v.strip().casefold()))
+
+        if previous is None:
+            rows = build(np.arange(len(df)))
+        else:
+            rows = _updated_rows(previous._rows, previous_rows, build)
+        self._rows = rows
+        self.table = rows[PEOPLE_COLUMNS]
+
+        self._by_practice = _positions_by(self.table['Practice Name'].to_numpy(dtype=object))
+        self._by_person = _positions_by(rows['_person'].to_numpy())
+        self._by_email = _positions_by(rows['_email'].to_numpy())
+        names = self.table['Person'].dropna().astype(str).str.strip()
+        if previous is not None and previous._names_key.equals(names.drop_duplicates().sort_values(ignore_index=True)):
+            self.names = previous.names
+        else:
+            self.names = PrefixIndex(names)
+        self._names_key = names.drop_duplicates().sort_values(ignore_index=True)
+
+    @staticmethod
+    def _rows_for(df, positions):
+        parts = []
+        for role, slot, name_col, email_col, share_col in _people_slots(df):
+            part = pd.DataFrame({
+                'Practice Name': df['Practice Name'].to_numpy(dtype=object),
+                'Role': role,
+                'Slot': slot,
+                'Person': df[name_col].to_numpy(dtype=object),
+                'Email': df[email_col].to_numpy(dtype=object) if email_col else None,
+                # float64 in every part, however compactly the frame stores each slot
+                'Shareholding (%)': df[share_col].to_numpy(dtype=np.float64) if share_col else np.nan,
+                '_row': positions,
+            })
+            parts.append(part[part[['Person', 'Email', 'Shareholding (%)']].notna().any(axis=1)])
+        table = pd.concat(parts, ignore_index=True)
+        # Keep each practice's rows together, in panel order
+        table = table.iloc[np.argsort(table['_row'].to_numpy(), kind='stable')].reset_index(drop=True)
+        return table.assign(Slot=table['Slot'].astype('Int64'))
+
+    def for_practice(self, practice_name):
+        return self.table.iloc[self._by_practice.get(practice_name, [])]
+
+    def practices_for(self, person):
+        """Rows for a person, matched by name (any case or accents) or by email address."""
+        rows = self._by_person.get(normalize_text(person))
+        if rows is None:
+            rows = self._by_email.get(person.strip().casefold(), [])
+        return self.table.iloc[rows]
@@ -0,0 +1,86 @@
+import tempfile
+
+import pandas as pd
+import xlsxwriter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK_ROWS = 10_000
+
+# Exports larger than this spill from memory to a temporary file while being written
+SPOOL_BYTES = 16 * 1024 * 1024
+
+
+def _chunks(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df, f, chunk_rows=CHUNK_ROWS):
+    f.write(df.head(0).to_csv(index=False).encode())
+    for chunk in _chunks(df, chunk_rows):
+        f.write(chunk.to_csv(index=False, header=False).encode())
+
+
+def _xlsx_value(value):
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    return value
+
+
+def write_xlsx(df, f, chunk_rows=CHUNK_ROWS):
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(f, {'constant_memory': True, 'default_date_format': 'yyyy-mm-dd',
+                                       'strings_to_urls': False})
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, [str(column) for column in df.columns])
+    row = 1
+    for chunk in _chunks(df, chunk_rows):
+        for values in chunk.itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, [_xlsx_value(value) for value in values])
+            row += 1
+    workbook.close()
+
+
+def write_parquet(df, f, chunk_rows=CHUNK_ROWS):
+    # Workbook columns often mix numbers and text, which Arrow cannot store in
+    # one column, so object columns are written as strings
+    df = df.astype({column: 'string' for column in df.columns if df[column].dtype == object})
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    with pq.ParquetWriter(f, schema) as writer:
+        for chunk in _chunks(df, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+
+
+# Format name -> (file extension, MIME type, writer)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv', write_csv),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', write_xlsx),
+}
+if pq is not None:
+    EXPORT_FORMATS['Parquet'] = ('parquet', 'application/vnd.apache.parquet', write_parquet)
+
+
+def export_file(df, export_format):
+    """Serialize ``df`` in ``export_format`` chunk by chunk into a temporary file.
+
+    The file is returned rewound for reading; the caller closes it.
+    """
+    _, _, writer = EXPORT_FORMATS[export_format]
+    f = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    try:
+        writer(df, f)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
@@ -0,0 +1,177 @@
+"""Offline geocoding and validation for Practice Coords.csv.
+
+Coordinates come from a local postcode-centroid gazetteer: a CSV with
+``postcode``, ``latitude`` and ``longitude`` columns covering UK postcodes
+and/or Irish Eircodes (routing-key centroids are enough for Ireland).
+Only practices that are new, whose Post Code or Full Address changed, or
+whose stored coordinates are missing or outside their country are looked
+up. Everything else is carried over unchanged.
+
+    python geocode.py --gazetteer postcodes.csv [--report report.csv] [--dry-run]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+import pandas as pd
+
+from data_prep import MERGE_KEYS, build_full_address, read_excel_cached
+
+# (min latitude, max latitude, min longitude, max longitude)
+COUNTRY_BOUNDS = {
+    'England': (49.8, 55.9, -6.5, 1.8),
+    'Scotland': (54.6, 60.9, -8.7, -0.7),
+    'Wales': (51.3, 53.5, -5.4, -2.6),
+    'Northern Ireland': (54.0, 55.4, -8.2, -5.4),
+    'Ireland': (51.4, 55.4, -10.7, -5.9),
+    'Isle of Man': (54.0, 54.45, -4.85, -4.3),
+    'Isle of Wight': (50.55, 50.8, -1.6, -1.05),
+    'Jersey': (49.15, 49.3, -2.3, -1.95),
+    'Guernsey': (49.4, 49.75, -2.75, -2.1),
+}
+BRITISH_ISLES_BOUNDS = (49.0, 61.0, -11.0, 2.0)
+
+# Normalized UK postcode; anything else is treated as an Eircode, which is a
+# 3-character routing key plus a 4-character identifier
+UK_POSTCODE = r'^[A-Z]{1,2}\d[A-Z\d]?\d[A-Z]{2}$'
+
+COORD_COLUMNS = MERGE_KEYS + ['Latitude', 'Longitude']
+
+
+def normalize_postcode(postcode):
+    if pd.isna(postcode):
+        return ''
+    return ''.join(str(postcode).split()).upper()
+
+
+def outward_code(postcode):
+    """The district part of a normalized UK postcode, or the routing key of an Eircode."""
+    if re.match(UK_POSTCODE, postcode):
+        return postcode[:-3]
+    return postcode[:3]
+
+
+def in_country(country, lat, lon):
+    if pd.isna(lat) or pd.isna(lon):
+        return False
+    lat_min, lat_max, lon_min, lon_max = COUNTRY_BOUNDS.get(country, BRITISH_ISLES_BOUNDS)
+    return lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+
+
+def load_gazetteer(path, postcodes, districts, chunksize=200_000):
+    """Centroids for the wanted ``postcodes`` and mean centroids for the wanted ``districts``.
+
+    The gazetteer is streamed in chunks and only matching rows are kept, so a
+    full national postcode file does not need to fit in memory.
+    """
+    exact = {}
+    district_sums = {}
+    reader = pd.read_csv(path, usecols=lambda c: c.strip().lower() in ('postcode', 'latitude', 'longitude'),
+                         dtype={'postcode': str}, chunksize=chunksize)
+    for chunk in reader:
+        chunk.columns = [c.strip().lower() for c in chunk.columns]
+        chunk = chunk.dropna(subset=['postcode', 'latitude', 'longitude'])
+        keys = chunk['postcode'].str.replace(r'\s+', '', regex=True).str.upper()
+
+        hits = keys.isin(postcodes)
+        exact.update(zip(keys[hits], zip(chunk['latitude'][hits], chunk['longitude'][hits])))
+
+        district_keys = keys.str[:-3].where(keys.str.match(UK_POSTCODE), keys.str[:3])
+        wanted = district_keys.isin(districts)
+        if wanted.any():
+            sums = chunk[wanted].groupby(district_keys[wanted])[['latitude', 'longitude']].agg(['sum', 'count'])
+            for district, row in sums.iterrows():
+                lat_sum, lon_sum, count = district_sums.get(district, (0.0, 0.0, 0))
+                district_sums[district] = (lat_sum + row[('latitude', 'sum')], lon_sum + row[('longitude', 'sum')],
+                                           count + row[('latitude', 'count')])
+
+    districts = {district: (lat_sum / count, lon_sum / count) for district, (lat_sum, lon_sum, count) in district_sums.items()}
+    return exact, districts
+
+
+def geocode_practices(practices_df, coords_df, gazetteer_path):
+    """Return the refreshed coordinates frame and a per-practice status report.
+
+    ``practices_df`` needs Practice Name, Post Code, Full Address and Country.
+    """
+    practices = practices_df.dropna(subset=['Practice Name'])[MERGE_KEYS + ['Country']].reset_index(drop=True)
+    existing = coords_df.drop_duplicates(subset=MERGE_KEYS, keep='last')
+    merged = practices.merge(existing[COORD_COLUMNS], on=MERGE_KEYS, how='left')
+
+    valid = [in_country(country, lat, lon) for country, lat, lon in zip(merged['Country'], merged['Latitude'], merged['Longitude'])]
+    status = pd.Series('unchanged', index=merged.index)
+    pending = ~pd.Series(valid, index=merged.index)
+    status[pending & merged['Latitude'].notna()] = 'outside country'
+
+    postcodes = merged['Post Code'].map(normalize_postcode)
+    districts = postcodes.map(outward_code)
+    if pending.any() and gazetteer_path:
+        exact, district_centroids = load_gazetteer(gazetteer_path, set(postcodes[pending]),
+                                                   set(districts[pending]))
+    else:
+        exact, district_centroids = {}, {}
+
+    for i in merged.index[pending]:
+        if postcodes[i] in exact:
+            coords, found = exact[postcodes[i]], 'geocoded'
+        elif districts[i] in district_centroids:
+            coords, found = district_centroids[districts[i]], 'geocoded (district centroid)'
+        else:
+            if status[i] != 'outside country':
+                status[i] = 'not found'
+            continue
+        if in_country(merged.at[i, 'Country'], *coords):
+            merged.at[i, 'Latitude'], merged.at[i, 'Longitude'] = coords
+            status[i] = found
+        else:
+            status[i] = 'gazetteer outside country'
+
+    report = merged[MERGE_KEYS + ['Country', 'Latitude', 'Longitude']].assign(Status=status)
+    return merged[COORD_COLUMNS], report
+
+
+def write_csv_atomic(df, path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='') as f:
+            # Match the checked-in file's CRLF line endings to keep diffs readable
+            df.to_csv(f, index=False, lineterminator='\r\n')
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--gazetteer', help='CSV with postcode, latitude and longitude columns')
+    parser.add_argument('--excel', default='Coy Details.xlsx')
+    parser.add_argument('--coords', default='Practice Coords.csv')
+    parser.add_argument('--report', help='write the per-practice status report to this CSV')
+    parser.add_argument('--dry-run', action='store_true', help='validate and report without writing the coords file')
+    args = parser.parse_args(argv)
+
+    practices = read_excel_cached(args.excel, columns=['Practice Name', 'Address', 'Post Code', 'Country'])
+    practices['Full Address'] = build_full_address(practices)
+    coords_df = pd.read_csv(args.coords, float_precision='round_trip') if os.path.exists(args.coords) else pd.DataFrame(columns=COORD_COLUMNS)
+
+    coords, report = geocode_practices(practices, coords_df, args.gazetteer)
+
+    print(report['Status'].value_counts().to_string())
+    flagged = report[~report['Status'].isin(['unchanged', 'geocoded', 'geocoded (district centroid)'])]
+    if not flagged.empty:
+        print('\nNeeds attention:')
+        print(flagged[['Practice Name', 'Post Code', 'Country', 'Status']].to_string(index=False))
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+    if not args.dry_run:
+        write_csv_atomic(coords, args.coords)
+    return 0 if flagged.empty else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,18 +1,24 @@
-#import streamlit as st
+import streamlit as st
 import pandas as pd
+import numpy as np
 import folium
-from streamlit_folium import folium_static
-from graphviz import Digraph
-import json
+from folium.plugins import MarkerCluster
+import streamlit.components.v1 as components
+from graphviz import Digraph, ExecutableNotFound
+import concurrent.futures
 import os
-import threading
-import socket
-import http.server
-import socketserver
 import plotly.express as px
-from io import BytesIO
 import base64
-import tempfile
+import tracemalloc
+from perf import recorder
+from export import EXPORT_FORMATS, export_file
+from reports import ReportStore, query_hash, report_definition
+from org_store import CycleError, OrgStore, organization_hash
+from spatial_index import practices_geojson
+from tile_proxy import TileCache, TileProxy, start_tile_server
+from asset_server import AssetStore, asset_path, start_asset_server
+from api import PracticeApi, start_api_server
+from data_prep import FALLBACK_COORDINATES, NO_ACQUISITION_DATE, DatasetStore, file_version, memory_report, project_report, select_practices
 
 st.set_page_config(layout = 'wide', page_title="Hakim")
 hide_st_style = """
@@ -35,90 +41,223 @@ hide_st_style = """
 
 st.markdown(hide_st_style, unsafe_allow_html=True)
 
-@st.cache_data
-def load_excel(file_path):
-    try:
-        return pd.read_excel(file_path)
-    except Exception as e:
-        st.error(f"Error loading Excel file: {e}")
-        return pd.DataFrame()
-
-@st.cache_data
-def load_csv(file_path):
-    try:
-        return pd.read_csv(file_path)
-    except Exception as e:
-        st.error(f"Error loading CSV file: {e}")
-        return pd.DataFrame()
-
-# Function to format website links
-def format_website(url):
-    if pd.isna(url):
-        return ''
-    if not url.startswith(('http://', 'https://')):
-        return 'http://' + url
-    return url
-
-# Function to shorten practice names
-def shorten_practice_name(name):
-    parts = name.split()
-    if len(parts) == 2:
-        return f"{parts[0]} {parts[1]}"
-    elif '-' in name:
-        hyphen_index = parts.index('-')
-        return f"{parts[0]} {parts[hyphen_index + 1]}"
-    return parts[0]
+# Start timing this rerun; see the Performance section of the admin page
+recorder.start_run()
 
 # Paths to your files
 excel_file_path = 'Coy Details.xlsx'
 json_file_path = 'organization_structures.json'
+org_db_path = 'organization_structures.db'
+saved_reports_path = 'saved_reports.json'
 practice_coords_file_path = 'Practice Coords.csv'
 
-# Load the Excel and CSV files
-df = load_excel(excel_file_path)
-coords_df = load_csv(practice_coords_file_path)
+# Deployment settings come from environment variables or top-level keys of
+# .streamlit/secrets.toml, which Streamlit copies into the environment
+st.secrets.load_if_toml_exists()
 
-# Ensure that the necessary columns exist before merging
-required_columns = ['Practice Name', 'Post Code', 'Full Address', 'Latitude', 'Longitude']
-for col in required_columns:
-    if col not in coords_df.columns:
-        st.error(f"Missing column in Practice Coords CSV: {col}")
+def setting(name, default=None):
+    return os.environ.get(name) or default
 
-# Ensure all rows are included by checking for missing data
-df.dropna(how='all', inplace=True)
+# Work the first paint does not need runs on this pool while the page is drawn;
+# callers wait on the returned futures where the results are used
+@st.cache_resource
+def load_background_pool():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix='background')
 
-# Format the website links
-df['Website'] = df['Website'].apply(format_website)
+background_pool = load_background_pool()
 
-# Concatenate 'Address' and 'Post Code' to form the complete address
-df['Full Address'] = df['Address'] + ', ' + df['Post Code']
+# Organizational structures live in SQLite
+@st.cache_resource
+def load_org_store(db_path):
+    return OrgStore(db_path)
 
-# Correctly parse the acquisition date and handle errors
-df['Acquisition date'] = pd.to_datetime(df['Acquisition date'], errors='coerce')
+org_store = load_org_store(org_db_path)
 
-# Replace missing acquisition dates with '1900-01-01'
-df['Acquisition date'] = df['Acquisition date'].fillna(pd.Timestamp('1900-01-01'))
+# Import practices whose entry in the old JSON file is new or changed, once per version
+# of the file. It runs alongside the practice data load; wait on org_sync before reading
+@st.cache_resource(show_spinner=False)
+def sync_org_json(version):
+    return background_pool.submit(recorder.timed("sync org json", recorder.current_run())(org_store.sync_json),
+                                  json_file_path)
 
-# Merge coordinates with the main dataframe
-try:
-    df = df.merge(coords_df, on=['Practice Name', 'Post Code', 'Full Address'], how='left')
-except Exception as e:
-    st.error(f"Error merging data: {e}")
+org_sync = sync_org_json(file_version(json_file_path))
+if org_sync.done() and org_sync.exception() is not None:
+    # Retry on the next rerun instead of keeping the failure for this version of the file
+    sync_org_json.clear()
+
+# Function to wait for the org JSON sync. If it failed, the store still has every
+# organisation saved so far, so the page carries on with a warning
+def wait_for_org_sync():
+    try:
+        org_sync.result()
+    except Exception as e:
+        st.warning(f"Could not import {json_file_path}; showing the organisations saved so far. {e}")
 
-# Handle any remaining missing coordinates with fallback coordinates
-fallback_coordinates = (53.3498, -6.2603)  # Coordinates for Dublin as fallback
-df['Latitude'] = df['Latitude'].fillna(fallback_coordinates[0])
-df['Longitude'] = df['Longitude'].fillna(fallback_coordinates[1])
+# Saved report definitions, shared by every session
+@st.cache_resource
+def load_report_store(path):
+    return ReportStore(path)
 
-# Shorten practice names for visualization
-df['Short Practice Name'] = df['Practice Name'].apply(shorten_practice_name)
+report_store = load_report_store(saved_reports_path)
 
-# Load existing organizational structures from a JSON file
-if os.path.exists(json_file_path):
-    with open(json_file_path, 'r') as f:
-        organizations = json.load(f)
-else:
-    organizations = {}
+# One store per process holds the prepared dataset for every session. When the
+# workbook or coords CSV changes on disk, the next rerun rebuilds only the
+# practices whose rows changed and swaps the new version in for everyone.
+@st.cache_resource
+def load_dataset_store():
+    return DatasetStore(excel_file_path, practice_coords_file_path)
+
+dataset_store = load_dataset_store()
+try:
+    with recorder.stage("dataset lookup"):
+        dataset = dataset_store.refresh()
+except Exception as e:
+    if dataset_store.current is None:
+        st.error(f"Error loading practice data: {e}")
+        st.stop()
+    # Keep serving the last good version until the files are fixed
+    st.warning(f"Could not reload practice data, showing the previous version: {e}")
+    dataset = dataset_store.current
+
+# The prepared frame is shared by every session, so it must be treated as read-only
+df = dataset.df
+dataset_version = dataset.version
+
+# Read-only JSON API for other internal tools, started once per process when
+# PRACTICES_API_PORT is set. It serves whatever version the dataset store holds and
+# the same org store as the app. It has no login and returns every column, Shark and
+# Fish emails and shareholdings included, so only expose it where the app's users
+# could see that data anyway.
+API_HOST = setting('PRACTICES_API_HOST', '127.0.0.1')
+API_PORT = setting('PRACTICES_API_PORT')
+
+# Function to start the API; returns the server, or the reason it could not start for the admin page
+@st.cache_resource
+def load_api_server():
+    if not API_PORT:
+        return None, None
+    try:
+        return start_api_server(PracticeApi(dataset_store.refresh, org_store), API_HOST, int(API_PORT)), None
+    except OSError as e:
+        # Port already taken, e.g. by another copy of the app or a standalone api.py
+        return None, str(e)
+
+api_server, api_error = load_api_server()
+
+# Prefix index for the sidebar practice search, rebuilt only when the practice names change.
+# The fuzzy matcher, spatial index, acquisitions cube and people table are built by the
+# dataset store in the background, and the dataset properties wait for them where they are used
+with recorder.stage("prefix index"):
+    prefix_index = dataset.prefix_index
+
+# Map style to tiles and attribution mapping
+MAP_TILES = {
+    "OpenStreetMap": "OpenStreetMap",
+    "Google Satellite": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}"
+}
+
+MAP_ATTRIBUTION = {
+    "OpenStreetMap": None,
+    "Google Satellite": "Google"
+}
+
+# Map tiles can go through a caching proxy started once per process. Browsers
+# fetch tiles from PRACTICES_TILE_PROXY_URL, the proxy's address as they reach it
+# (e.g. through the reverse proxy in front of the app); without it maps load
+# tiles directly from the tile providers.
+TILE_PROXY_HOST = setting('PRACTICES_TILE_PROXY_HOST', '127.0.0.1')
+TILE_PROXY_PORT = int(setting('PRACTICES_TILE_PROXY_PORT', 8765))
+TILE_PROXY_URL = setting('PRACTICES_TILE_PROXY_URL')
+
+# Map style to proxy tile source and the attribution folium adds for built-in tiles
+MAP_TILE_SOURCES = {
+    "OpenStreetMap": "osm",
+    "Google Satellite": "satellite"
+}
+
+PROXY_ATTRIBUTION = {
+    "OpenStreetMap": '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors',
+    "Google Satellite": "Google"
+}
+
+@st.cache_resource
+def load_tile_server():
+    if not TILE_PROXY_URL:
+        return None
+    try:
+        return start_tile_server(TileProxy(TileCache()), TILE_PROXY_HOST, TILE_PROXY_PORT)
+    except OSError:
+        # Port already taken, e.g. by another copy of the app; maps fetch tiles directly instead
+        return None
+
+tile_server = load_tile_server()
+
+# Generated maps and org charts can be served by content hash from a second server,
+# so pages carry short links instead of the documents themselves. It has no login
+# of its own, so PRACTICES_ASSET_URL should be behind the same access control as
+# the app; without it the documents are sent inline. Exports hold contact details
+# and always go through st.download_button, which the app serves itself.
+ASSET_SERVER_HOST = setting('PRACTICES_ASSET_HOST', '127.0.0.1')
+ASSET_SERVER_PORT = int(setting('PRACTICES_ASSET_PORT', 8766))
+ASSET_SERVER_URL = setting('PRACTICES_ASSET_URL')
+
+@st.cache_resource
+def load_asset_server():
+    if not ASSET_SERVER_URL:
+        return None
+    try:
+        return start_asset_server(AssetStore(), ASSET_SERVER_HOST, ASSET_SERVER_PORT)
+    except OSError:
+        # Port already taken; pages fall back to sending the documents inline
+        return None
+
+asset_server = load_asset_server()
+
+# Function to publish a generated file; returns its URL, or None if it has to be sent inline
+def publish_asset(data, content_type, file_name):
+    if asset_server is None:
+        return None
+    key = asset_server.service.put(data, content_type)
+    return None if key is None else ASSET_SERVER_URL.rstrip('/') + asset_path(key, file_name)
+
+# Function to pick the tile URL and attribution for a map style
+def map_tiles(style):
+    if tile_server is None:
+        return MAP_TILES[style], MAP_ATTRIBUTION[style]
+    return f"{TILE_PROXY_URL.rstrip('/')}/tiles/{MAP_TILE_SOURCES[style]}/{{z}}/{{x}}/{{y}}", PROXY_ATTRIBUTION[style]
+
+# Function to render a practice map to HTML, keeping the most recently used maps in memory
+@st.cache_resource(max_entries=128, show_spinner=False)
+def render_practice_map(practice_name, full_address, latitude, longitude, style):
+    tiles, attr = map_tiles(style)
+    m = folium.Map(location=[latitude, longitude], zoom_start=15, tiles=tiles, attr=attr)
+    folium.Marker(
+        location=[latitude, longitude],
+        popup=f"{practice_name}<br>{full_address}",
+        icon=folium.Icon(color='blue', icon='info-sign')
+    ).add_to(m)
+    map_html = m.get_root().render()
+    return map_html, base64.b64encode(map_html.encode()).decode()
+
+# Function to render every practice on one clustered map, once per dataset version and style
+@st.cache_resource(max_entries=4, show_spinner="Rendering portfolio map...")
+def render_portfolio_map(_df, version, style):
+    tiles, attr = map_tiles(style)
+    m = folium.Map(location=[54.5, -4.0], zoom_start=6, tiles=tiles, attr=attr)
+    cluster = MarkerCluster().add_to(m)
+    folium.GeoJson(
+        practices_geojson(_df),
+        popup=folium.GeoJsonPopup(fields=['name', 'address'], labels=False),
+        tooltip=folium.GeoJsonTooltip(fields=['name'], labels=False)
+    ).add_to(cluster)
+    return m.get_root().render()
+
+# Function to list nearby practices from spatial index hits
+def nearby_practices(hits):
+    positions = [position for position, _ in hits]
+    nearby = df.iloc[positions][['Practice Name', 'Full Address', 'Country']].reset_index(drop=True)
+    nearby['Distance (km)'] = [round(distance, 1) for _, distance in hits]
+    return nearby
 
 # Function to create the Graphviz chart
 def create_org_chart(organization):
@@ -129,29 +268,51 @@ def create_org_chart(organization):
             dot.edge(role, report)
     return dot
 
-def display_structure(role, organization):
-    if role in organization:
+# Function to lay out an org chart once per distinct organization; falls back to
+# browser-side layout when the Graphviz binaries are not installed
+@st.cache_resource(max_entries=256, show_spinner=False)
+def render_org_chart(content_hash, _organization):
+    dot = create_org_chart(_organization)
+    try:
+        svg = dot.pipe(format='svg', encoding='utf-8')
+    except ExecutableNotFound:
+        return dot.source, None
+    return dot.source, svg[svg.index('<svg'):]
+
+def display_structure(role, organization, hierarchy, shown=None):
+    shown = set() if shown is None else shown
+    if role in organization and role not in shown:
+        shown.add(role)
         st.subheader(f"{role}: {organization[role]['name']}")
-        reports = organization[role].get("reports", [])
+        reports = hierarchy.children.get(role, [])
         if reports:
             st.write("Reports to:")
             for report in reports:
                 if st.button(report):
-                    display_structure(report, organization)
+                    display_structure(report, organization, hierarchy, shown)
+        indirect = [report for report, distance in hierarchy.descendants.get(role, {}).items() if distance > 1]
+        if indirect:
+            st.write(f"Indirect reports: {', '.join(indirect)}")
 
-def save_organizations():
-    with open(json_file_path, 'w') as f:
-        json.dump(organizations, f, indent=4)
+def parse_reports(reports):
+    return [report.strip() for report in reports.split(",") if report.strip()]
 
 def admin_page():
     st.header("Admin Page")
+    wait_for_org_sync()
+    if api_error:
+        st.warning(f"The practice API could not start on {API_HOST}:{API_PORT}: {api_error}")
+    on_fallback = ((df['Latitude'] == FALLBACK_COORDINATES[0]) & (df['Longitude'] == FALLBACK_COORDINATES[1])).sum()
+    if on_fallback:
+        st.warning(f"{on_fallback} practices have no coordinates and are shown at the fallback location. "
+                   "Run geocode.py to refresh Practice Coords.csv.")
     practice_names = list(df['Practice Name'].unique())
     selected_practice = st.selectbox("Select Practice Name to Manage", practice_names)
 
     if selected_practice:
         st.write(f"Managing organizational structure for: **{selected_practice}**")
 
-        organization = organizations.get(selected_practice, {})
+        organization = org_store.get(selected_practice)
 
         # Add a new role
         with st.form(key="add_role_form"):
@@ -161,11 +322,13 @@ def admin_page():
             new_reports = st.text_input("Reports (comma-separated)")
             if st.form_submit_button("Add Role"):
                 if new_role and new_name:
-                    reports_list = [report.strip() for report in new_reports.split(",")]
-                    organization[new_role] = {"name": new_name, "reports": reports_list}
-                    organizations[selected_practice] = organization
-                    save_organizations()
-                    st.success(f"Added {new_role} to {selected_practice}")
+                    try:
+                        org_store.put_role(selected_practice, new_role, new_name, parse_reports(new_reports))
+                    except CycleError as e:
+                        st.error(f"{new_role} was not added. {e}")
+                    else:
+                        organization = org_store.get(selected_practice)
+                        st.success(f"Added {new_role} to {selected_practice}")
 
         # Edit an existing role
         if organization:
@@ -176,11 +339,13 @@ def admin_page():
                 new_reports = st.text_input("New Reports (comma-separated)", value=", ".join(organization[edit_role]["reports"]))
                 if st.form_submit_button("Edit Role"):
                     if edit_role and new_name:
-                        reports_list = [report.strip() for report in new_reports.split(",")]
-                        organization[edit_role] = {"name": new_name, "reports": reports_list}
-                        organizations[selected_practice] = organization
-                        save_organizations()
-                        st.success(f"Updated {edit_role} in {selected_practice}")
+                        try:
+                            org_store.put_role(selected_practice, edit_role, new_name, parse_reports(new_reports))
+                        except CycleError as e:
+                            st.error(f"{edit_role} was not updated. {e}")
+                        else:
+                            organization = org_store.get(selected_practice)
+                            st.success(f"Updated {edit_role} in {selected_practice}")
 
         # Delete a role
         if organization:
@@ -189,21 +354,144 @@ def admin_page():
                 delete_role = st.selectbox("Select a role to delete", list(organization.keys()))
                 if st.form_submit_button("Delete Role"):
                     if delete_role in organization:
-                        del organization[delete_role]
-                        organizations[selected_practice] = organization
-                        save_organizations()
+                        org_store.delete_role(selected_practice, delete_role)
                         st.success(f"Deleted {delete_role} from {selected_practice}")
 
+    # Reporting lines across every practice
+    st.subheader("Reporting lines across practices")
+    report_role = st.text_input("Everyone under role")
+    if report_role:
+        lines = org_store.reports_under(report_role)
+        if lines:
+            st.dataframe(pd.DataFrame(lines, columns=['Practice Name', 'Role', 'Levels Below']))
+        else:
+            st.write(f"No practice has roles under {report_role}.")
+
+    # Timings of recent reruns across all sessions in this process
+    st.subheader("Performance")
+    st.caption(f"Practice data: {len(dataset.df)} rows, {dataset.changed_rows} recomputed when this version was loaded.")
+    frame_memory = memory_report(dataset.df)
+    total_mib = frame_memory['Bytes'].sum() / 2 ** 20
+    frame_memory['MiB'] = (frame_memory.pop('Bytes') / 2 ** 20).round(3)
+    st.caption(f"Practice data memory: {total_mib:.1f} MiB per app process, by column:")
+    st.dataframe(frame_memory)
+    track_memory = st.checkbox("Track peak memory per stage (slows the app down)", value=tracemalloc.is_tracing())
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    st.dataframe(recorder.summary())
+    st.download_button("Download JSON trace", recorder.to_json(), file_name="perf_trace.json", mime="application/json")
+    if st.button("Clear timings"):
+        recorder.clear()
+
+# Plotly figures for the acquisitions charts, built once per dataset version and country selection
+@st.cache_resource(max_entries=256, show_spinner=False)
+def acquisitions_by_year_figure(_acquisitions, version, countries):
+    acquisitions_by_year = _acquisitions.by_year(countries)
+    fig = px.bar(acquisitions_by_year, x=acquisitions_by_year.index, y=acquisitions_by_year.values,
+                 labels={'x': 'Year', 'y': 'Number of Acquisitions'}, title='Number of Acquisitions by Year',
+                 height=500, text=acquisitions_by_year.values)  # Add numbers on bars
+    fig.update_traces(marker_color='blue')  # Remove colors
+    return fig
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def acquisitions_by_month_figure(_acquisitions, version, year, countries):
+    acquisitions_by_month = _acquisitions.by_month(year, countries)
+    fig = px.bar(acquisitions_by_month, x='Month', y='Count',
+                 labels={'Count': 'Number of Acquisitions'}, title=f'Number of Acquisitions in {year} by Month',
+                 width=450, height=400, text='Count')  # Add numbers on bars
+    fig.update_layout(yaxis=dict(tickformat='d'))  # Remove decimal numbers from y-axis
+    fig.update_traces(marker_color='blue', width=0.5)  # Remove colors and make bars narrower
+    return fig
+
+# Function to read the first column of an uploaded CSV or Excel file; CSVs are read in chunks
+def read_uploaded_names(uploaded_file, chunk_rows=50_000):
+    if uploaded_file.name.endswith(".csv"):
+        return [name for chunk in pd.read_csv(uploaded_file, usecols=[0], chunksize=chunk_rows) for name in chunk.iloc[:, 0]]
+    return pd.read_excel(uploaded_file, usecols=[0]).iloc[:, 0].tolist()
+
+# Function to report fuzzy and unmatched entries of a matched practice name list
+def show_name_matches(matches):
+    unmatched = matches[matches['Matched Practice'].isna()]
+    if not unmatched.empty:
+        st.warning(f"{len(unmatched)} names did not match any practice.")
+    inexact = matches[matches['Score'] < 1]
+    if not inexact.empty:
+        with st.expander("Fuzzy and unmatched names"):
+            st.dataframe(inexact.reset_index(drop=True))
+
+# Function to run a report's filters once per query and dataset version; it keeps
+# only the positions of the matching rows, not the rows themselves
+@st.cache_resource(max_entries=64, show_spinner=False)
+@recorder.timed("run report query")
+def run_report_query(query_key, version, _definition):
+    positions, matches = np.arange(len(df)), None
+    if _definition['terms']:
+        # The dataset store keeps the full-text index up to date; the first search may wait for it
+        positions = np.flatnonzero(dataset.text_index.mask(_definition['terms'], _definition['search_columns']))
+    if _definition['practices']:
+        matches = dataset.fuzzy_matcher.match(_definition['practices'])
+        positions = np.intersect1d(positions, select_practices(df, matches['Matched Practice'].dropna().unique()))
+    return positions, matches
+
+# Function to copy out the selected columns of a report's rows, with dates as text
+@st.cache_resource(max_entries=64, show_spinner=False)
+@recorder.timed("project report")
+def report_rows(query_key, version, columns, _positions):
+    return project_report(df, list(columns), _positions)
+
+# Function to offer a download of an export; the file is only built once requested
+def export_controls(export_df, file_stem):
+    export_format = st.selectbox("Export format", list(EXPORT_FORMATS), key=f"{file_stem}_format")
+    if st.button("Prepare download", key=f"{file_stem}_prepare"):
+        extension, mime, _ = EXPORT_FORMATS[export_format]
+        with recorder.stage(f"export {export_format}"):
+            export_data = export_file(export_df, export_format)
+        # st.download_button only takes the contents in memory
+        with export_data:
+            st.download_button(f"Download {export_format} file", export_data.read(),
+                               file_name=f"{file_stem}.{extension}", mime=mime, key=f"{file_stem}_download")
+
+# Function to let users save the report they are looking at under a name
+def save_report_controls(definition, file_stem):
+    report_name = st.sidebar.text_input("Save this report as", key=f"{file_stem}_report_name")
+    if st.sidebar.button("Save report", key=f"{file_stem}_save_report", disabled=not report_name):
+        report_store.save(report_name, definition)
+        st.sidebar.success(f"Saved report '{report_name}'")
+
+# Function to show a report with its column picker, export and save controls
+def show_report(definition, title, file_stem):
+    with recorder.stage("report query"):
+        positions, matches = run_report_query(query_hash(definition), dataset_version, definition)
+    if matches is not None:
+        show_name_matches(matches)
+
+    st.sidebar.header("Select Columns")
+    selected_columns = []
+    for column in df.columns:
+        if st.sidebar.checkbox(column, value=column in definition['columns']):
+            selected_columns.append(column)
+
+    filtered_df = report_rows(query_hash(definition), dataset_version, tuple(selected_columns), positions)
+
+    st.write(f"### {title}")
+    st.dataframe(filtered_df)
+
+    export_controls(filtered_df, file_stem)
+    save_report_controls(dict(definition, columns=selected_columns), file_stem)
+
 def main():
     st.title("Practice Details and Organizational Structure")
 
     st.sidebar.header("User Actions")
 
     # User types the first letter(s)
-    search_input = st.sidebar.text_input("Type the first 1-3 letters of Practice Name").upper()
+    search_input = st.sidebar.text_input("Type the first 1-3 letters of Practice Name")
 
     if search_input:
-        practice_names = sorted([name for name in df['Practice Name'].unique() if name.upper().startswith(search_input)])
+        with recorder.stage("practice search"):
+            practice_names = prefix_index.search(search_input)
         practice_name = st.sidebar.selectbox("Select Practice Name", practice_names)
 
         if practice_name:
@@ -227,52 +515,41 @@ def main():
                 st.session_state.map_style = map_style
                 st.experimental_rerun()
 
-            # Filter the dataframe based on the selected Practice Name
-            selected_practice = df[df['Practice Name'] == practice_name].iloc[0]
-
-            # Map style to tiles and attribution mapping
-            tiles = {
-                "OpenStreetMap": "OpenStreetMap",
-                "Google Satellite": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}"
-            }
-
-            attribution = {
-                "OpenStreetMap": None,
-                "Google Satellite": "Google"
-            }
-
-            # Function to create the map
-            def create_map(style):
-                map_center = [selected_practice['Latitude'], selected_practice['Longitude']]
-                m = folium.Map(location=map_center, zoom_start=15, tiles=tiles[style], attr=attribution[style])
-                popup_text = f"{selected_practice['Practice Name']}<br>{selected_practice['Full Address']}"
-                folium.Marker(
-                    location=[selected_practice['Latitude'], selected_practice['Longitude']],
-                    popup=popup_text,
-                    icon=folium.Icon(color='blue', icon='info-sign')
-                ).add_to(m)
-                return m
+            # Look up the selected practice's row by position instead of scanning every name
+            position = dataset.rows_by_name[practice_name][0]
+            selected_practice = df.iloc[position]
 
             # Display Address
             st.write(f"**Address:** {selected_practice['Full Address']}")
 
-            # Create and display the map based on the selected style
-            m = create_map(st.session_state.map_style)
-            folium_static(m, width=300, height=200)
-
-            # Save the map to a temporary HTML file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".html") as tmp_file:
-                m.save(tmp_file.name)
-                map_path = tmp_file.name
-
-            # Encode the HTML file in base64
-            with open(map_path, 'rb') as f:
-                map_base64 = base64.b64encode(f.read()).decode()
+            # Render the map once per practice and style; the embedded map and the
+            # full-size link share the same cached document
+            with recorder.stage("practice map"):
+                map_html, map_base64 = render_practice_map(
+                    selected_practice['Practice Name'], selected_practice['Full Address'],
+                    selected_practice['Latitude'], selected_practice['Longitude'], st.session_state.map_style)
+                map_url = publish_asset(map_html, 'text/html; charset=utf-8', 'map.html')
+                if map_url:
+                    components.iframe(map_url, width=300, height=210)
+                else:
+                    components.html(map_html, width=300, height=210)
+                    map_url = f"data:text/html;base64,{map_base64}"
 
             # Provide a link to open the full-size map in a new tab
-            html_link = f'<a href="data:text/html;base64,{map_base64}" target="_blank">Open Full-Size Map</a>'
+            html_link = f'<a href="{map_url}" target="_blank">Open Full-Size Map</a>'
             st.markdown(html_link, unsafe_allow_html=True)
 
+            # Find other practices near the selected one
+            with st.expander("Practices Near Here"):
+                near_mode = st.radio("Find", ["Nearest practices", "Within distance"], horizontal=True)
+                if near_mode == "Nearest practices":
+                    count = st.number_input("Number of practices", min_value=1, max_value=50, value=5)
+                    hits = dataset.spatial_index.nearest(selected_practice['Latitude'], selected_practice['Longitude'], count, exclude=[position])
+                else:
+                    radius = st.number_input("Distance (km)", min_value=1.0, max_value=500.0, value=25.0)
+                    hits = [hit for hit in dataset.spatial_index.within(selected_practice['Latitude'], selected_practice['Longitude'], radius) if hit[0] != position]
+                st.dataframe(nearby_practices(hits))
+
             # Adjust the CSS to make the dropdown the same width as the map
             st.markdown(
                 """
@@ -292,7 +569,7 @@ def main():
             col1, col2 = st.columns(2)
             with col1:
                 st.markdown("### Practice Information")
-                acquisition_date = "None Provided" if selected_practice['Acquisition date'] == pd.Timestamp('1900-01-01') else selected_practice['Acquisition date'].strftime('%Y-%m-%d')
+                acquisition_date = "None Provided" if selected_practice['Acquisition date'] == NO_ACQUISITION_DATE else selected_practice['Acquisition date'].strftime('%Y-%m-%d')
                 st.markdown(f"""
                 **Practice Name:** {selected_practice['Practice Name']}  
                 **Legal Entity:** {selected_practice['Legal Entity']}  
@@ -309,27 +586,25 @@ def main():
             with col2:
                 st.markdown("### Top Management Details")
                 details = []
+                # The long-form Shark/Fish/buddy table is built in the background; wait for it here
+                with recorder.stage("people table"):
+                    people = dataset.people
+
+                for person in people.for_practice(practice_name).to_dict('records'):
+                    role = person['Role']
+                    label = role if pd.isna(person['Slot']) else f"{role} {person['Slot']}"
+                    if role == 'Shark':
+                        fields = [(' Name', person['Person']), (' Email Address', person['Email'])]
+                    elif role == 'Fish':
+                        fields = [(' Name', person['Person']), (' Email', person['Email'])]
+                    else:
+                        fields = [('', person['Person'])]
+                    for field, value in fields:
+                        if not pd.isna(value):
+                            details.append(f"**{label}{field}:** {value}")
+                    if not pd.isna(person['Shareholding (%)']):
+                        details.append(f"**{label} Shareholding - %:** {person['Shareholding (%)']}  \n")
 
-                for i in range(1, 7):
-                    if not pd.isna(selected_practice[f'Shark {i} (name)']):
-                        details.append(f"**Shark {i} Name:** {selected_practice[f'Shark {i} (name)']}")
-                    if not pd.isna(selected_practice[f'Shark {i} (email address)']):
-                        details.append(f"**Shark {i} Email Address:** {selected_practice[f'Shark {i} (email address)']}")
-                    if not pd.isna(selected_practice[f'Shark {i} (shareholding - %)']):
-                        details.append(f"**Shark {i} Shareholding - %:** {selected_practice[f'Shark {i} (shareholding - %)']}  \n")
-
-                for i in range(1, 6):
-                    if not pd.isna(selected_practice[f'Fish {i} (name)']):
-                        details.append(f"**Fish {i} Name:** {selected_practice[f'Fish {i} (name)']}")
-                    if not pd.isna(selected_practice[f'Fish {i} (email)']):
-                        details.append(f"**Fish {i} Email:** {selected_practice[f'Fish {i} (email)']}")
-
-                if not pd.isna(selected_practice['Primary Buddy']):
-                    details.append(f"**Primary Buddy:** {selected_practice['Primary Buddy']}")
-                if not pd.isna(selected_practice['Secondary Buddy']):
-                    details.append(f"**Secondary Buddy:** {selected_practice['Secondary Buddy']}")
-                if not pd.isna(selected_practice['Senior Buddy']):
-                    details.append(f"**Senior Buddy:** {selected_practice['Senior Buddy']}")
                 if not pd.isna(selected_practice['ID']):
                     details.append(f"**ID:** {selected_practice['ID']}")
 
@@ -338,10 +613,19 @@ def main():
             # Practice Structure button
             if st.button("Practice Structure"):
                 st.header(f"Organizational Structure for {practice_name}")
-                if practice_name in organizations:
-                    organization = organizations[practice_name]
-                    org_chart = create_org_chart(organization)
-                    st.graphviz_chart(org_chart)
+                wait_for_org_sync()
+                organization = org_store.get(practice_name)
+                if organization:
+                    with recorder.stage("org chart"):
+                        org_source, org_svg = render_org_chart(organization_hash(organization), organization)
+                    org_svg_url = publish_asset(org_svg, 'image/svg+xml', 'org-chart.svg') if org_svg else None
+                    if org_svg_url:
+                        st.markdown(f'<div class="stGraphvizChart"><img src="{org_svg_url}" alt="Organizational chart"></div>',
+                                    unsafe_allow_html=True)
+                    elif org_svg:
+                        st.markdown(f'<div class="stGraphvizChart"><div>{org_svg}</div></div>', unsafe_allow_html=True)
+                    else:
+                        st.graphviz_chart(org_source)
                     
                     # Select role dropdown
                     roles = list(organization.keys())
@@ -355,85 +639,77 @@ def main():
                         st.session_state.selected_role = selected_role
                         st.experimental_rerun()
                     if st.session_state.selected_role != 'None':
-                        display_structure(st.session_state.selected_role, organization)
+                        try:
+                            hierarchy = org_store.hierarchy(practice_name)
+                        except CycleError as e:
+                            st.error(f"The reporting lines of {practice_name} cannot be shown. {e}. "
+                                     "Fix the roles on the admin page.")
+                        else:
+                            display_structure(st.session_state.selected_role, organization, hierarchy)
                 else:
                     st.write("No organizational structure data available for this practice.")
 
+    st.sidebar.title("People")
+    person_input = st.sidebar.text_input("Type a Shark, Fish or Buddy name")
+    if person_input:
+        with recorder.stage("people table"):
+            people = dataset.people
+        person_names = people.names.search(person_input)
+        person = st.sidebar.selectbox("Select Person", person_names)
+        if person:
+            st.header(f"Practices for {person}")
+            st.dataframe(people.practices_for(person).reset_index(drop=True))
+
+    st.sidebar.title("Portfolio Map")
+    if st.sidebar.checkbox("Show Portfolio Map"):
+        st.header("All Practices")
+        with recorder.stage("portfolio map"):
+            portfolio_html = render_portfolio_map(df, dataset_version, st.session_state.get('map_style', 'OpenStreetMap'))
+        portfolio_url = publish_asset(portfolio_html, 'text/html; charset=utf-8', 'portfolio-map.html')
+        if portfolio_url:
+            components.iframe(portfolio_url, height=600)
+        else:
+            components.html(portfolio_html, height=600)
+
     st.sidebar.title("Toggle By Acquisitions")
     show_acquisitions = st.sidebar.checkbox("Toggle Acquisitions")
 
-    df_valid_dates = df[df['Acquisition date'] != pd.Timestamp('1900-01-01')]
-    df_no_acquisition = df[df['Acquisition date'] == pd.Timestamp('1900-01-01')]
-
     if show_acquisitions:
+        # Acquisition counts by year, month and country, built in the background
+        with recorder.stage("acquisitions cube"):
+            acquisitions = dataset.acquisitions
+        countries = tuple(st.sidebar.multiselect("Countries (all if empty)", acquisitions.countries))
+
         st.sidebar.markdown("#### Acquisitions: All Years")
         general_acquisition = st.sidebar.checkbox("Show All Acquisitions")
 
         if general_acquisition:
             # Plotly visualization: Number of acquisitions by year (general)
-            acquisitions_by_year = df_valid_dates['Acquisition date'].dt.year.value_counts().sort_index()
-            acquisitions_by_year = acquisitions_by_year[acquisitions_by_year > 0]  # Exclude years with zero acquisitions
-            fig = px.bar(acquisitions_by_year, x=acquisitions_by_year.index, y=acquisitions_by_year.values,
-                         labels={'x': 'Year', 'y': 'Number of Acquisitions'}, title='Number of Acquisitions by Year',
-                         height=500, text=acquisitions_by_year.values)  # Add numbers on bars
-            fig.update_traces(marker_color='blue')  # Remove colors
-            st.plotly_chart(fig)
+            with recorder.stage("acquisitions charts"):
+                st.plotly_chart(acquisitions_by_year_figure(acquisitions, dataset_version, countries))
 
         st.sidebar.markdown("#### Yearly Acquisitions")
-        years = sorted(df_valid_dates['Acquisition date'].dt.year.unique())
         selected_years = []
-        for year in years:
+        for year in acquisitions.years:
             if st.sidebar.checkbox(f"Show {year}"):
                 selected_years.append(year)
 
         col1, col2 = st.columns(2)  # Layout in 2 columns
 
         for i, year in enumerate(selected_years):
-            if i % 2 == 0:
-                with col1:
-                    st.markdown(f"### Acquisitions in {year}")
-                    acquisitions_in_year = df_valid_dates[df_valid_dates['Acquisition date'].dt.year == year]
-                    acquisitions_in_year['Month'] = acquisitions_in_year['Acquisition date'].dt.strftime('%B')
-                    acquisitions_in_year['Month'] = pd.Categorical(acquisitions_in_year['Month'], categories=[
-                        'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'], ordered=True)
-                    acquisitions_by_month = acquisitions_in_year.groupby(['Month']).size().reset_index(name='Count')
-                    fig = px.bar(acquisitions_by_month, x='Month', y='Count',
-                                 labels={'Count': 'Number of Acquisitions'}, title=f'Number of Acquisitions in {year} by Month',
-                                 width=450, height=400, text='Count')  # Add numbers on bars
-                    fig.update_layout(yaxis=dict(tickformat='d'))  # Remove decimal numbers from y-axis
-                    fig.update_traces(marker_color='blue', width=0.5)  # Remove colors and make bars narrower
-                    st.plotly_chart(fig)
-                    if st.button(f"View {year}"):
-                        view_data = acquisitions_in_year[['Practice Name', 'Acquisition date', 'Country']].reset_index(drop=True)
-                        view_data['Acquisition date'] = view_data['Acquisition date'].dt.strftime('%Y-%m-%d')
-                        st.write(view_data)
-            else:
-                with col2:
-                    st.markdown(f"### Acquisitions in {year}")
-                    acquisitions_in_year = df_valid_dates[df_valid_dates['Acquisition date'].dt.year == year]
-                    acquisitions_in_year['Month'] = acquisitions_in_year['Acquisition date'].dt.strftime('%B')
-                    acquisitions_in_year['Month'] = pd.Categorical(acquisitions_in_year['Month'], categories=[
-                        'January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December'], ordered=True)
-                    acquisitions_by_month = acquisitions_in_year.groupby(['Month']).size().reset_index(name='Count')
-                    fig = px.bar(acquisitions_by_month, x='Month', y='Count',
-                                 labels={'Count': 'Number of Acquisitions'}, title=f'Number of Acquisitions in {year} by Month',
-                                 width=450, height=400, text='Count')  # Add numbers on bars
-                    fig.update_layout(yaxis=dict(tickformat='d'))  # Remove decimal numbers from y-axis
-                    fig.update_traces(marker_color='blue', width=0.5)  # Remove colors and make bars narrower
-                    st.plotly_chart(fig)
-                    if st.button(f"View {year}"):
-                        view_data = acquisitions_in_year[['Practice Name', 'Acquisition date', 'Country']].reset_index(drop=True)
-                        view_data['Acquisition date'] = view_data['Acquisition date'].dt.strftime('%Y-%m-%d')
-                        st.write(view_data)
+            with col1 if i % 2 == 0 else col2:
+                st.markdown(f"### Acquisitions in {year}")
+                with recorder.stage("acquisitions charts"):
+                    st.plotly_chart(acquisitions_by_month_figure(acquisitions, dataset_version, year, countries))
+                if st.button(f"View {year}"):
+                    st.write(acquisitions.practices(year, countries))
 
         st.sidebar.markdown("#### Practices with No Acquisition Date")
         show_no_acquisition = st.sidebar.checkbox("No Acquisition Date")
         
         if show_no_acquisition:
             st.markdown("### Practices with No Acquisition Date")
-            view_data = df_no_acquisition[['Practice Name', 'Acquisition date', 'Country']].reset_index(drop=True)
-            view_data['Acquisition date'] = view_data['Acquisition date'].dt.strftime('%Y-%m-%d')
-            st.write(view_data)
+            st.write(acquisitions.no_date)
 
     st.sidebar.title("Admin")
     admin_section = st.sidebar.expander("Admin Login", expanded=False)
@@ -450,7 +726,7 @@ def main():
     if show_filters:
         # Filter Types
         st.sidebar.header("Filter Types")
-        filter_type = st.sidebar.radio("Select Filter Type", ["Defined Criteria Filter", "Random Filter", "Upload and Filter"])
+        filter_type = st.sidebar.radio("Select Filter Type", ["Defined Criteria Filter", "Random Filter", "Upload and Filter", "Saved Reports"])
 
         if filter_type == "Defined Criteria Filter":
             st.sidebar.header("Defined Criteria Filter")
@@ -460,32 +736,11 @@ def main():
             search_terms = []
             for i in range(num_criteria):
                 search_terms.append(st.sidebar.text_input(f"Search Criterion {i+1}"))
+            search_columns = st.sidebar.multiselect("Search in columns (all if empty)", df.columns.tolist())
 
             if any(search_terms):
-                def multiple_search(row):
-                    return all(term.lower() in str(row).lower() for term in search_terms if term)
-                filtered_df = df[df.apply(multiple_search, axis=1)]
-
-                st.sidebar.header("Select Columns")
-                columns = filtered_df.columns.tolist()
-                selected_columns = []
-                for column in columns:
-                    if st.sidebar.checkbox(column):
-                        selected_columns.append(column)
-
-                filtered_df = filtered_df[selected_columns]
-
-                # Remove trailing zeros in date columns
-                for col in filtered_df.select_dtypes(include=['datetime64[ns]']).columns:
-                    filtered_df[col] = filtered_df[col].dt.strftime('%Y-%m-%d')
-
-                st.write("### Search Results")
-                st.dataframe(filtered_df)
-
-                csv = filtered_df.to_csv(index=False)
-                b64 = base64.b64encode(csv.encode()).decode()  # B64 encode
-                href = f'<a href="data:file/csv;base64,{b64}" download="filtered_practices.csv">Download CSV file</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                show_report(report_definition(terms=search_terms, search_columns=search_columns),
+                            "Search Results", "filtered_practices")
 
         elif filter_type == "Random Filter":
             st.sidebar.header("Random Filter")
@@ -493,61 +748,35 @@ def main():
             
             if practice_list_input:
                 practice_list = practice_list_input.splitlines()
-                filtered_df = df[df['Practice Name'].isin(practice_list)]
-
-                st.sidebar.header("Select Columns")
-                columns = filtered_df.columns.tolist()
-                selected_columns = []
-                for column in columns:
-                    if st.sidebar.checkbox(column):
-                        selected_columns.append(column)
-
-                filtered_df = filtered_df[selected_columns]
-
-                # Remove trailing zeros in date columns
-                for col in filtered_df.select_dtypes(include=['datetime64[ns]']).columns:
-                    filtered_df[col] = filtered_df[col].dt.strftime('%Y-%m-%d')
-                
-                st.write("### Report for Selected Practices")
-                st.dataframe(filtered_df)
-                
-                csv = filtered_df.to_csv(index=False)
-                b64 = base64.b64encode(csv.encode()).decode()  # B64 encode
-                href = f'<a href="data:file/csv;base64,{b64}" download="selected_practices.csv">Download CSV file</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                show_report(report_definition(practices=practice_list),
+                            "Report for Selected Practices", "selected_practices")
 
         elif filter_type == "Upload and Filter":
             st.sidebar.header("Upload and Filter")
             uploaded_file = st.sidebar.file_uploader("Upload an Excel or CSV file with practice names", type=["csv", "xlsx"])
             
             if uploaded_file:
-                if uploaded_file.name.endswith(".csv"):
-                    uploaded_df = pd.read_csv(uploaded_file)
+                practice_list = read_uploaded_names(uploaded_file)
+                show_report(report_definition(practices=practice_list),
+                            "Report for Uploaded Practices", "uploaded_practices")
+
+        elif filter_type == "Saved Reports":
+            st.sidebar.header("Saved Reports")
+            report_names = report_store.names()
+            if not report_names:
+                st.sidebar.info("No saved reports yet. Run one of the other filters and save it.")
+            else:
+                report_name = st.sidebar.selectbox("Select a saved report", report_names)
+                if st.sidebar.button("Delete this report"):
+                    report_store.delete(report_name)
+                    st.experimental_rerun()
+                definition = report_store.get(report_name)
+                if definition is None:
+                    # Deleted from another session since the list was read
+                    st.warning(f"The report '{report_name}' no longer exists.")
                 else:
-                    uploaded_df = pd.read_excel(uploaded_file)
-                practice_list = uploaded_df.iloc[:, 0].tolist()
-                filtered_df = df[df['Practice Name'].isin(practice_list)]
-
-                st.sidebar.header("Select Columns")
-                columns = filtered_df.columns.tolist()
-                selected_columns = []
-                for column in columns:
-                    if st.sidebar.checkbox(column):
-                        selected_columns.append(column)
-
-                filtered_df = filtered_df[selected_columns]
-
-                # Remove trailing zeros in date columns
-                for col in filtered_df.select_dtypes(include=['datetime64[ns]']).columns:
-                    filtered_df[col] = filtered_df[col].dt.strftime('%Y-%m-%d')
-                
-                st.write("### Report for Uploaded Practices")
-                st.dataframe(filtered_df)
-                
-                csv = filtered_df.to_csv(index=False)
-                b64 = base64.b64encode(csv.encode()).decode()  # B64 encode
-                href = f'<a href="data:file/csv;base64,{b64}" download="uploaded_practices.csv">Download CSV file</a>'
-                st.markdown(href, unsafe_allow_html=True)
+                    show_report(definition, f"Report: {report_name}", "saved_report")
 
 if __name__ == "__main__":
-    main()
+    with recorder.stage("main"):
+        main()
@@ -0,0 +1,27 @@
+"""Threaded HTTP servers run beside the app: the JSON API, the asset server and the tile proxy.
+
+Each pairs a request handler with the object it serves, which handlers
+reach as ``self.server.service``.
+"""
+import http.server
+import socketserver
+import threading
+
+
+class ServiceServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, handler, service):
+        super().__init__(address, handler)
+        self.service = service
+
+
+def start_server(handler, service, host='127.0.0.1', port=0, name='http-service'):
+    """Serve ``service`` with ``handler`` from a daemon thread and return the server.
+
+    Raises OSError if the port is taken. ``server.server_address`` has the
+    port actually bound when ``port`` is 0.
+    """
+    server = ServiceServer((host, port), handler, service)
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return server
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS roles (
+    practice TEXT NOT NULL,
+    role TEXT NOT NULL,
+    name TEXT NOT NULL,
+    reports TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (practice, role)
+);
+CREATE TABLE IF NOT EXISTS practices (
+    practice TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS role_depths (
+    practice TEXT NOT NULL,
+    role TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (practice, role)
+);
+CREATE TABLE IF NOT EXISTS reporting_lines (
+    practice TEXT NOT NULL,
+    ancestor TEXT NOT NULL,
+    descendant TEXT NOT NULL,
+    distance INTEGER NOT NULL,
+    PRIMARY KEY (practice, ancestor, descendant)
+);
+CREATE INDEX IF NOT EXISTS reporting_lines_ancestor ON reporting_lines (ancestor);
+CREATE TABLE IF NOT EXISTS json_imports (
+    practice TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+);
+"""
+
+# Bump when the schema changes; older databases have their hierarchy rebuilt on open
+SCHEMA_VERSION = 2
+
+
+class CycleError(ValueError):
+    pass
+
+
+def organization_hash(organization):
+    """Content hash of an organisation, including role order."""
+    return hashlib.sha256(json.dumps(organization).encode()).hexdigest()
+
+
+class Hierarchy:
+    """Reporting lines of one organisation.
+
+    ``parents`` and ``children`` map each role to the roles directly above and
+    below it, ``depth`` is the shortest distance from a top-level role, and
+    ``descendants`` maps each role to ``{report: distance}`` for all direct and
+    indirect reports. Roles that are only named in someone's reports are
+    included. Raises CycleError if the reporting lines loop.
+    """
+
+    def __init__(self, organization):
+        self.children = {}
+        self.parents = {}
+        for role, info in organization.items():
+            reports = list(dict.fromkeys(info.get('reports', [])))
+            self.children[role] = reports
+            self.parents.setdefault(role, [])
+            for report in reports:
+                self.children.setdefault(report, [])
+                self.parents.setdefault(report, []).append(role)
+
+        self._check_acyclic()
+
+        self.depth = {}
+        level = [role for role, parents in self.parents.items() if not parents]
+        distance = 0
+        while level:
+            level = [role for role in level if role not in self.depth]
+            for role in level:
+                self.depth[role] = distance
+            level = [report for role in level for report in self.children[role]]
+            distance += 1
+
+        self.descendants = {}
+        for role in self.children:
+            found = {}
+            level, distance = self.children[role], 1
+            while level:
+                level = [report for report in level if report not in found]
+                for report in level:
+                    found[report] = distance
+                level = [child for report in level for child in self.children[report]]
+                distance += 1
+            self.descendants[role] = found
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+        for start in self.children:
+            if start in done:
+                continue
+            stack = [(start, iter(self.children[start]))]
+            path = [start]
+            visiting.add(start)
+            while stack:
+                role, reports = stack[-1]
+                report = next(reports, None)
+                if report is None:
+                    stack.pop()
+                    path.pop()
+                    visiting.discard(role)
+                    done.add(role)
+                elif report in visiting:
+                    loop = path[path.index(report):] + [report]
+                    raise CycleError(f"Reporting cycle: {' -> '.join(loop)}")
+                elif report not in done:
+                    visiting.add(report)
+                    path.append(report)
+                    stack.append((report, iter(self.children[report])))
+
+
+class OrgStore:
+    """Organisation structures stored one row per (practice, role) in SQLite.
+
+    The database runs in WAL mode so readers never block the writer, and every
+    write touches a single practice inside one transaction, so admins editing
+    different practices cannot overwrite each other. Reads are served from an
+    in-memory copy that is refreshed when the practice's revision changes.
+    Organisations are returned as ``{role: {"name": ..., "reports": [...]}}``
+    in the order roles were added, matching the old JSON layout.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._cache = {}
+        self._hierarchies = {}
+        self._lock = threading.Lock()
+        with closing(self._connect()) as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                conn.execute('BEGIN IMMEDIATE')
+                practices = [row[0] for row in conn.execute('SELECT DISTINCT practice FROM roles')]
+                for practice in practices:
+                    try:
+                        self._index_hierarchy(conn, practice)
+                    except CycleError:
+                        # Saved before cycles were rejected; it stays unindexed until fixed
+                        pass
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                conn.execute('COMMIT')
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA busy_timeout = 30000')
+        return conn
+
+    def _load(self, conn, practice):
+        rows = conn.execute('SELECT role, name, reports FROM roles WHERE practice = ? ORDER BY position',
+                            (practice,)).fetchall()
+        return {role: {'name': name, 'reports': json.loads(reports)} for role, name, reports in rows}
+
+    def _index_hierarchy(self, conn, practice):
+        hierarchy = Hierarchy(self._load(conn, practice))
+        conn.execute('DELETE FROM role_depths WHERE practice = ?', (practice,))
+        conn.execute('DELETE FROM reporting_lines WHERE practice = ?', (practice,))
+        conn.executemany('INSERT INTO role_depths (practice, role, depth) VALUES (?, ?, ?)',
+                         [(practice, role, depth) for role, depth in hierarchy.depth.items()])
+        conn.executemany(
+            'INSERT INTO reporting_lines (practice, ancestor, descendant, distance) VALUES (?, ?, ?, ?)',
+            [(practice, role, report, distance)
+             for role, reports in hierarchy.descendants.items() for report, distance in reports.items()])
+
+    @contextmanager
+    def _write(self, practice):
+        with closing(self._connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                # Rejects cycles before anything is committed
+                self._index_hierarchy(conn, practice)
+                conn.execute(
+                    'INSERT INTO practices (practice, revision) VALUES (?, 1) '
+                    'ON CONFLICT (practice) DO UPDATE SET revision = revision + 1', (practice,))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+    def revision(self, practice):
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT revision FROM practices WHERE practice = ?', (practice,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, practice):
+        """The organisation for ``practice``; an empty dict if it has none."""
+        revision = self.revision(practice)
+        with self._lock:
+            cached = self._cache.get(practice)
+        if cached and cached[0] == revision:
+            return cached[1]
+
+        with closing(self._connect()) as conn:
+            # Read the revision and rows in one snapshot so they always agree
+            conn.execute('BEGIN')
+            row = conn.execute('SELECT revision FROM practices WHERE practice = ?', (practice,)).fetchone()
+            organization = self._load(conn, practice)
+            conn.execute('COMMIT')
+        with self._lock:
+            self._cache[practice] = (row[0] if row else 0, organization)
+        return organization
+
+    def hierarchy(self, practice):
+        """The reporting hierarchy of ``practice``, cached until it next changes."""
+        organization = self.get(practice)
+        with self._lock:
+            cached = self._hierarchies.get(practice)
+        if cached and cached[0] is organization:
+            return cached[1]
+        hierarchy = Hierarchy(organization)
+        with self._lock:
+            self._hierarchies[practice] = (organization, hierarchy)
+        return hierarchy
+
+    def reports_under(self, role, practice=None):
+        """Direct and indirect reports of ``role`` as (practice, role, distance) rows, across all practices by default."""
+        query = 'SELECT practice, descendant, distance FROM reporting_lines WHERE ancestor = ?'
+        params = [role]
+        if practice is not None:
+            query += ' AND practice = ?'
+            params.append(practice)
+        with closing(self._connect()) as conn:
+            return conn.execute(query + ' ORDER BY practice, distance, descendant', params).fetchall()
+
+    def roles_at_depth(self, depth):
+        """(practice, role) rows for every role ``depth`` levels below the top of its practice."""
+        with closing(self._connect()) as conn:
+            return conn.execute('SELECT practice, role FROM role_depths WHERE depth = ? ORDER BY practice, role',
+                                (depth,)).fetchall()
+
+    def put_role(self, practice, role, name, reports):
+        """Add ``role`` to ``practice`` or replace it, keeping its position.
+
+        Raises CycleError, leaving the practice unchanged, if the new reports loop back.
+        """
+        with self._write(practice) as conn:
+            conn.execute(
+                'INSERT INTO roles (practice, role, name, reports, position) '
+                'VALUES (?, ?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM roles WHERE practice = ?)) '
+                'ON CONFLICT (practice, role) DO UPDATE SET name = excluded.name, reports = excluded.reports',
+                (practice, role, name, json.dumps(reports), practice))
+
+    def delete_role(self, practice, role):
+        with self._write(practice) as conn:
+            conn.execute('DELETE FROM roles WHERE practice = ? AND role = ?', (practice, role))
+
+    @staticmethod
+    def _replace_roles(conn, practice, organization):
+        conn.execute('DELETE FROM roles WHERE practice = ?', (practice,))
+        conn.executemany(
+            'INSERT INTO roles (practice, role, name, reports, position) VALUES (?, ?, ?, ?, ?)',
+            [(practice, role, info['name'], json.dumps(info.get('reports', [])), position)
+             for position, (role, info) in enumerate(organization.items())])
+
+    def replace(self, practice, organization):
+        """Replace every role of ``practice`` in one transaction."""
+        with self._write(practice) as conn:
+            self._replace_roles(conn, practice, organization)
+
+    def sync_json(self, json_path):
+        """Re-import the practices whose entry in the JSON file changed since it was last imported.
+
+        Each practice's entry is hashed when it is imported, and entries with
+        the same hash are skipped, so admin edits to those practices are kept.
+        A store filled before hashes were recorded adopts the file's current
+        hashes without re-importing. Returns the number of practices imported
+        and a ``{practice: error}`` dict for those skipped because their
+        reporting lines loop.
+        """
+        if not os.path.exists(json_path):
+            return 0, {}
+        with open(json_path, 'r') as f:
+            organizations = json.load(f)
+        hashes = {practice: organization_hash(organization) for practice, organization in organizations.items()}
+
+        with closing(self._connect()) as conn:
+            imported = dict(conn.execute('SELECT practice, hash FROM json_imports'))
+            if not imported and conn.execute('SELECT 1 FROM roles LIMIT 1').fetchone() is not None:
+                conn.executemany('INSERT OR REPLACE INTO json_imports (practice, hash) VALUES (?, ?)',
+                                 hashes.items())
+                return 0, {}
+
+        count, skipped = 0, {}
+        for practice, organization in organizations.items():
+            if imported.get(practice) == hashes[practice]:
+                continue
+            try:
+                with self._write(practice) as conn:
+                    self._replace_roles(conn, practice, organization)
+                    conn.execute('INSERT OR REPLACE INTO json_imports (practice, hash) VALUES (?, ?)',
+                                 (practice, hashes[practice]))
+                count += 1
+            except CycleError as e:
+                skipped[practice] = str(e)
+        return count, skipped
@@ -0,0 +1,114 @@
+import collections
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+
+class PerfRecorder:
+    """Per-stage wall-clock timings for the most recent script runs.
+
+    Call ``start_run`` at the top of each rerun, then wrap work in
+    ``stage(name)`` or decorate functions with ``timed(name)``. Stages are
+    attributed to the run started on the same thread; work handed to another
+    thread passes that run explicitly, and stages with no run are dropped.
+    When ``tracemalloc`` is tracing, each stage also records its peak
+    allocation above the memory in use when it started, including the peaks
+    of stages nested in it; with several sessions running at once the peaks
+    are approximate because tracemalloc is process-wide.
+    """
+
+    def __init__(self, max_runs=200):
+        self._runs = collections.deque(maxlen=max_runs)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start_run(self, label=''):
+        run = self.add_run(label)
+        self._local.run = run
+        return run
+
+    def add_run(self, label=''):
+        """Record a run without binding it to this thread, for work outside a rerun."""
+        run = {'label': label, 'started': time.time(), 'stages': []}
+        with self._lock:
+            self._runs.append(run)
+        return run
+
+    def current_run(self):
+        """The run started on this thread, or None."""
+        return getattr(self._local, 'run', None)
+
+    @contextmanager
+    def stage(self, name, run=None):
+        """Time the block as stage ``name`` of ``run``, by default this thread's run."""
+        if run is None:
+            run = self.current_run()
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            start_memory, peak = tracemalloc.get_traced_memory()
+            # Highest peak of each open stage on this thread from before a nested
+            # stage reset it, innermost last
+            peaks = self._local.__dict__.setdefault('peaks', [])
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if tracing:
+                peak = max(peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if peaks:
+                    peaks[-1] = max(peaks[-1], peak)
+                peak -= start_memory
+            if run is not None:
+                run['stages'].append({'stage': name, 'seconds': seconds, 'peak_bytes': peak})
+
+    def timed(self, name=None, run=None):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.stage(name or func.__name__, run):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def runs(self):
+        with self._lock:
+            return [dict(run, stages=list(run['stages'])) for run in self._runs]
+
+    def summary(self):
+        """One row per stage with its call count, p50/p95/max milliseconds and largest peak in KiB."""
+        rows = collections.defaultdict(list)
+        peaks = collections.defaultdict(list)
+        for run in self.runs():
+            for stage in run['stages']:
+                rows[stage['stage']].append(stage['seconds'] * 1000)
+                if stage['peak_bytes'] is not None:
+                    peaks[stage['stage']].append(stage['peak_bytes'] / 1024)
+        summary = pd.DataFrame([
+            {'Stage': name, 'Calls': len(times), 'p50 (ms)': np.percentile(times, 50),
+             'p95 (ms)': np.percentile(times, 95), 'Max (ms)': max(times),
+             'Peak (KiB)': max(peaks[name]) if peaks[name] else None}
+            for name, times in rows.items()
+        ], columns=['Stage', 'Calls', 'p50 (ms)', 'p95 (ms)', 'Max (ms)', 'Peak (KiB)'])
+        return summary.sort_values('p95 (ms)', ascending=False).reset_index(drop=True).round(2)
+
+    def to_json(self):
+        return json.dumps({'runs': self.runs()}, indent=2)
+
+    def clear(self):
+        with self._lock:
+            self._runs.clear()
+
+
+recorder = PerfRecorder()
@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+import pandas as pd
+
+# Parts of a report definition that decide which practices it returns
+QUERY_FIELDS = ['terms', 'search_columns', 'practices']
+
+
+def report_definition(terms=(), search_columns=(), practices=(), columns=()):
+    """A report as saved: filter terms, the columns they search, a practice name list and the columns shown.
+
+    Practice names are normalized the way FuzzyMatcher reads them, so a
+    definition round-trips through JSON unchanged.
+    """
+    return {
+        'terms': [term for term in terms if term],
+        'search_columns': list(search_columns),
+        'practices': ['' if pd.isna(name) else str(name).strip() for name in practices],
+        'columns': list(columns),
+    }
+
+
+def query_hash(definition):
+    """Hash of the filter part of ``definition``; the selected columns are left out."""
+    query = {field: definition.get(field, []) for field in QUERY_FIELDS}
+    return hashlib.sha256(json.dumps(query, sort_keys=True).encode()).hexdigest()
+
+
+class ReportStore:
+    """Named report definitions in a JSON file, rewritten atomically on every change."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, reports):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, staging = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(reports, f, indent=4)
+            os.replace(staging, self.path)
+        except BaseException:
+            os.remove(staging)
+            raise
+
+    def names(self):
+        return sorted(self._read())
+
+    def get(self, name):
+        """The definition saved as ``name``, or None."""
+        return self._read().get(name)
+
+    def save(self, name, definition):
+        with self._lock:
+            reports = self._read()
+            reports[name] = definition
+            self._write(reports)
+
+    def delete(self, name):
+        with self._lock:
+            reports = self._read()
+            if reports.pop(name, None) is not None:
+                self._write(reports)
@@ -0,0 +1,281 @@
+import bisect
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_text(text):
+    """Case-fold ``text``, strip accents and collapse punctuation to single spaces."""
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(' ', text.casefold()).strip()
+
+
+class PrefixIndex:
+    """Sorted prefix index over practice names.
+
+    Every name is indexed under its normalized form and under each suffix that
+    starts at a word boundary, so "opt" finds "Alan Miller Optometrists".
+    Lookups are two binary searches plus the size of the result.
+    """
+
+    def __init__(self, names):
+        entries = sorted((normalize_text(name), name) for name in {name for name in names if isinstance(name, str)})
+        self._keys = [key for key, _ in entries]
+        self._names = [name for _, name in entries]
+
+        token_entries = []
+        for i, key in enumerate(self._keys):
+            for match in re.finditer(r' ', key):
+                token_entries.append((key[match.end():], i))
+        token_entries.sort()
+        self._token_keys = [key for key, _ in token_entries]
+        self._token_ids = [i for _, i in token_entries]
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _range(keys, prefix):
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_left(keys, prefix + '\uffff', lo)
+        return lo, hi
+
+    def search(self, prefix, tokens=True):
+        """Names starting with ``prefix``, followed by names with a later word starting with it.
+
+        Both groups are in sorted order.
+        """
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        lo, hi = self._range(self._keys, prefix)
+        matches = self._names[lo:hi]
+        if tokens:
+            t_lo, t_hi = self._range(self._token_keys, prefix)
+            ids = sorted({i for i in self._token_ids[t_lo:t_hi] if not lo <= i < hi})
+            matches = matches + [self._names[i] for i in ids]
+        return matches
+
+
+def _column_text(series):
+    text = series.astype(str).str.casefold()
+    return text.where(series.notna(), '')
+
+
+class TextSearchIndex:
+    """Case-insensitive substring search over every cell of a frame.
+
+    The normalized text of each row is built once; per-column text is built the
+    first time a search is scoped to that column. Results are boolean masks
+    aligned with the indexed frame.
+
+    Passing the index of an earlier version of the frame as ``previous``,
+    with ``previous_rows`` giving each row's position in that version (-1 for
+    new or changed rows), reuses the row text of unchanged rows.
+    """
+
+    # Joins cells so a term cannot match across a column boundary
+    _SEPARATOR = '\x1f'
+
+    def __init__(self, df, previous=None, previous_rows=None):
+        self._df = df
+        self._columns = {}
+        if previous is not None and list(previous._df.columns) == list(df.columns):
+            positions = np.asarray(previous_rows)
+            rows = previous._rows.to_numpy()[np.maximum(positions, 0)]
+            fresh = positions < 0
+            if fresh.any():
+                changed = df[fresh]
+                rows[fresh] = self._join([_column_text(changed[column]) for column in df.columns], changed).to_numpy()
+            self._rows = pd.Series(rows, index=df.index, dtype=object)
+        else:
+            self._rows = self._join([_column_text(df[column]) for column in df.columns], df)
+
+    @classmethod
+    def _join(cls, texts, df):
+        if texts:
+            return texts[0].str.cat(texts[1:], sep=cls._SEPARATOR)
+        return pd.Series('', index=df.index)
+
+    def _column(self, column):
+        if column not in self._columns:
+            self._columns[column] = _column_text(self._df[column])
+        return self._columns[column]
+
+    def mask(self, terms, columns=None):
+        """Rows containing every term, optionally looking only at ``columns``."""
+        terms = [term.casefold() for term in terms if term]
+        mask = np.ones(len(self._rows), dtype=bool)
+        for term in terms:
+            if columns:
+                term_mask = np.zeros(len(self._rows), dtype=bool)
+                for column in columns:
+                    term_mask |= self._column(column).str.contains(term, regex=False).to_numpy()
+            else:
+                term_mask = self._rows.str.contains(term, regex=False).to_numpy()
+            mask &= term_mask
+        return mask
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# Cap on the query x practice count matrix scored at once
+MATCH_BATCH_CELLS = 1 << 20
+
+
+class FuzzyMatcher:
+    """Match free-typed practice names against the known names.
+
+    Names that agree after normalization are exact hits. Everything else is
+    scored against the known names using the Dice coefficient over character
+    trigrams. Queries are scored in batches: each query first counts only its
+    rarest trigrams, which bounds every name's score from above, and only the
+    few names whose bound reaches the score of the name sharing most of them
+    are counted in full, so common trigrams such as "opt" are never walked per
+    query. Results are the same as scoring every name.
+    """
+
+    def __init__(self, names, threshold=0.6):
+        self.threshold = threshold
+        self._names = sorted({name for name in names if isinstance(name, str)})
+        self._exact = {}
+        self._gram_ids = {}
+        postings = []
+        name_grams = []
+        for i, name in enumerate(self._names):
+            key = normalize_text(name)
+            self._exact.setdefault(key, name)
+            ids = [self._gram_ids.setdefault(gram, len(self._gram_ids)) for gram in _trigrams(key)]
+            for gram_id in ids:
+                if gram_id == len(postings):
+                    postings.append([])
+                postings[gram_id].append(i)
+            name_grams.append(ids)
+        self._postings = [np.array(ids, dtype=np.intp) for ids in postings]
+        self._posting_sizes = [len(ids) for ids in postings]
+        self._sizes = np.array([len(ids) for ids in name_grams], dtype=np.intp)
+        # Trigram ids of every name, one name after another
+        self._name_grams = np.array([gram_id for ids in name_grams for gram_id in ids], dtype=np.intp)
+        self._offsets = np.concatenate([[0], np.cumsum(self._sizes)])
+        # Trigram lists longer than this are left to the bound rather than counted
+        self._rare_hits = max(len(self._names) // 4, 1)
+
+    def best_match(self, name):
+        """``(practice name, score)`` for ``name``, or ``(None, best score)`` below the threshold."""
+        return self._best_matches([name])[0]
+
+    def _best_matches(self, names):
+        results = [None] * len(names)
+        pending = []
+        for i, name in enumerate(names):
+            key = normalize_text(name)
+            if not key:
+                results[i] = (None, 0.0)
+            elif key in self._exact:
+                results[i] = (self._exact[key], 1.0)
+            else:
+                pending.append((i, key))
+        batch_size = max(MATCH_BATCH_CELLS // max(len(self._names), 1), 1)
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for (i, _), (best, score) in zip(batch, self._score([key for _, key in batch])):
+                results[i] = (self._names[best] if best is not None and score >= self.threshold else None), score
+        return results
+
+    def _shared(self, rows, ids, query_grams):
+        """Trigrams each name ``ids[k]`` shares with query ``rows[k]``; ``query_grams`` is a rows x trigrams mask."""
+        lengths = self._sizes[ids]
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        positions = np.repeat(self._offsets[ids] - starts, lengths) + np.arange(ends[-1])
+        hits = query_grams[np.repeat(rows, lengths), self._name_grams[positions]]
+        return np.add.reduceat(hits, starts, dtype=np.intp)
+
+    def _score(self, keys):
+        """``(name position, score)`` of the best-scoring name for each key, ``(None, 0.0)`` if none shares a trigram."""
+        n = len(self._names)
+        if not n:
+            return [(None, 0.0)] * len(keys)
+        sizes = np.empty(len(keys), dtype=np.intp)
+        rest = np.empty(len(keys), dtype=np.intp)
+        query_grams = np.zeros((len(keys), len(self._gram_ids)), dtype=bool)
+        rare_hits = np.zeros(len(keys), dtype=np.intp)
+        known, rare = [], []
+        gram_ids, posting_sizes = self._gram_ids, self._posting_sizes
+        for row, key in enumerate(keys):
+            grams = _trigrams(key)
+            ids = sorted([gram_ids[gram] for gram in grams if gram in gram_ids], key=posting_sizes.__getitem__)
+            query_grams[row, ids] = True
+            sizes[row] = len(grams)
+            known.append(ids)
+            # Count the rarest trigrams, always at least one
+            taken, hits = 0, 0
+            for gram_id in ids:
+                if taken and hits + posting_sizes[gram_id] > self._rare_hits:
+                    break
+                hits += posting_sizes[gram_id]
+                taken += 1
+            rare.extend(ids[:taken])
+            rare_hits[row] = hits
+            rest[row] = len(ids) - taken
+        hits = np.concatenate([self._postings[gram_id] for gram_id in rare]) if rare else np.empty(0, dtype=np.intp)
+        hits += np.repeat(np.arange(len(keys)) * n, rare_hits)
+        partial = np.bincount(hits, minlength=len(keys) * n).reshape(len(keys), n)
+
+        # The name sharing most rare trigrams gives a score every candidate must reach
+        rows = np.arange(len(keys))
+        lead = partial.argmax(axis=1)
+        lead_shared = self._shared(rows, lead, query_grams)
+        lead_total = sizes + self._sizes[lead]
+        # A name can share at most its rare count plus every remaining trigram. Where
+        # even names sharing no rare trigram could reach the lead, count in full.
+        full = rest * lead_total >= lead_shared * (sizes + self._sizes.min())
+        needed = -(-lead_shared * (sizes + self._sizes.min()) // lead_total) - rest
+        needed[full] = n + 1
+        candidate_rows, candidate_ids = np.divmod(np.flatnonzero(partial >= needed[:, None]), n)
+        bound = (partial[candidate_rows, candidate_ids] + rest[candidate_rows]) * lead_total[candidate_rows]
+        keep = bound >= lead_shared[candidate_rows] * (sizes[candidate_rows] + self._sizes[candidate_ids])
+        candidate_rows, candidate_ids = candidate_rows[keep], candidate_ids[keep]
+
+        results = [(None, 0.0)] * len(keys)
+        if len(candidate_rows):
+            shared = self._shared(candidate_rows, candidate_ids, query_grams)
+            scores = 2 * shared / (sizes[candidate_rows] + self._sizes[candidate_ids])
+            # Highest score per query, the first name in sorted order on ties
+            order = np.lexsort((candidate_ids, -scores, candidate_rows))
+            firsts = order[np.r_[True, candidate_rows[order][1:] != candidate_rows[order][:-1]]]
+            for k in firsts:
+                results[candidate_rows[k]] = (int(candidate_ids[k]), float(scores[k]))
+        for row in np.flatnonzero(full):
+            if known[row]:
+                shared = np.bincount(np.concatenate([self._postings[gram_id] for gram_id in known[row]]), minlength=n)
+                scores = 2 * shared / (sizes[row] + self._sizes)
+                best = int(np.argmax(scores))
+                results[row] = (best, float(scores[best]))
+        return results
+
+    def match(self, names):
+        """Frame of Uploaded Name, Matched Practice and Score, one row per input name.
+
+        Blank names are left out and repeated inputs are only scored once.
+        Unmatched rows have no Matched Practice.
+        """
+        names = ['' if pd.isna(name) else str(name).strip() for name in names]
+        names = [name for name in names if name]
+        distinct = list(dict.fromkeys(names))
+        results = dict(zip(distinct, self._best_matches(distinct)))
+        return pd.DataFrame({
+            'Uploaded Name': names,
+            'Matched Practice': [results[name][0] for name in names],
+            'Score': [round(results[name][1], 3) for name in names],
+        })
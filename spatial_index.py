@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; accepts scalars or numpy arrays."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class GridIndex:
+    """Fixed-size lat/lon grid over a set of points.
+
+    Radius queries only compute distances for points in the grid cells that
+    overlap the query's bounding box. Results are ``(position, distance_km)``
+    pairs sorted by distance, where ``position`` is the point's position in
+    the arrays the index was built from.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_degrees=0.5):
+        self.latitudes = np.asarray(latitudes, dtype=float)
+        self.longitudes = np.asarray(longitudes, dtype=float)
+        self.cell_degrees = cell_degrees
+
+        rows = np.floor(self.latitudes / cell_degrees).astype(int)
+        cols = np.floor(self.longitudes / cell_degrees).astype(int)
+        order = np.lexsort((cols, rows))
+        self._cells = {}
+        if len(order):
+            keys = np.stack([rows[order], cols[order]], axis=1)
+            starts = np.flatnonzero(np.r_[True, np.any(keys[1:] != keys[:-1], axis=1)])
+            for start, stop in zip(starts, np.r_[starts[1:], len(order)]):
+                self._cells[(rows[order[start]], cols[order[start]])] = order[start:stop]
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _candidates(self, lat, lon, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        # Longitude degrees shrink towards the poles; clamp to avoid dividing by zero
+        lon_span = lat_span / max(math.cos(math.radians(min(abs(lat) + lat_span, 89.9))), 1e-6)
+        if lon_span >= 180:
+            return np.arange(len(self))
+        row_range = range(math.floor((lat - lat_span) / self.cell_degrees), math.floor((lat + lat_span) / self.cell_degrees) + 1)
+        col_range = range(math.floor((lon - lon_span) / self.cell_degrees), math.floor((lon + lon_span) / self.cell_degrees) + 1)
+        if len(row_range) * len(col_range) > len(self._cells):
+            return np.arange(len(self))
+        found = [self._cells[(r, c)] for r in row_range for c in col_range if (r, c) in self._cells]
+        return np.concatenate(found) if found else np.empty(0, dtype=int)
+
+    def within(self, lat, lon, radius_km):
+        """All points within ``radius_km`` of (lat, lon), nearest first."""
+        ids = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.latitudes[ids], self.longitudes[ids])
+        keep = distances <= radius_km
+        ids, distances = ids[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return list(zip(ids[order].tolist(), distances[order].tolist()))
+
+    def nearest(self, lat, lon, n, exclude=()):
+        """The ``n`` points closest to (lat, lon), skipping positions in ``exclude``."""
+        exclude = set(exclude)
+        wanted = min(n, len(self) - sum(0 <= position < len(self) for position in exclude))
+        if wanted <= 0:
+            return []
+        radius_km = self.cell_degrees * KM_PER_DEGREE_LAT
+        while True:
+            hits = [hit for hit in self.within(lat, lon, radius_km) if hit[0] not in exclude]
+            if len(hits) >= wanted or radius_km > math.pi * EARTH_RADIUS_KM:
+                return hits[:n]
+            radius_km *= 2
+
+
+def practices_geojson(df):
+    """FeatureCollection of practice points with name, address and country properties."""
+    features = [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [float(lon), float(lat)]},
+            'properties': {'name': name, 'address': address, 'country': country},
+        }
+        for name, address, country, lat, lon in zip(
+            df['Practice Name'], df['Full Address'].fillna(''), df['Country'].astype(object).fillna(''), df['Latitude'], df['Longitude'])
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
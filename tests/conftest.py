@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
+
+from synthetic import make_coords, make_practices  # noqa: E402
+
+
+@pytest.fixture
+def practice_files(tmp_path):
+    """Paths of a small synthetic workbook and coords CSV."""
+    practices = make_practices(60)
+    excel_path = str(tmp_path / 'Coy Details.xlsx')
+    coords_path = str(tmp_path / 'Practice Coords.csv')
+    practices.to_excel(excel_path, index=False, engine='xlsxwriter')
+    make_coords(practices).to_csv(coords_path, index=False)
+    return excel_path, coords_path
@@ -0,0 +1,127 @@
+import json
+import urllib.parse
+
+import pandas as pd
+import pytest
+
+from api import PracticeApi
+from data_prep import DatasetStore
+from org_store import OrgStore
+
+ORGANIZATION = {'Director': {'name': 'Ann', 'reports': ['Manager']}, 'Manager': {'name': 'Bob', 'reports': []}}
+
+
+@pytest.fixture
+def dataset_store(practice_files, tmp_path):
+    return DatasetStore(*practice_files, cache_dir=str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def org_store(tmp_path):
+    return OrgStore(str(tmp_path / 'org.db'))
+
+
+@pytest.fixture
+def api(dataset_store, org_store):
+    return PracticeApi(dataset_store.refresh, org_store)
+
+
+def _get(api, target):
+    status, body, _ = api.handle(target)
+    return status, json.loads(body)
+
+
+def _path(*parts):
+    return '/' + '/'.join(urllib.parse.quote(part) for part in parts)
+
+
+def test_practice_names_are_paged(api, dataset_store):
+    names = list(dataset_store.refresh().rows_by_name)
+    status, body = _get(api, '/api/practices?offset=5&limit=10')
+    assert status == 200
+    assert body == {'total': len(names), 'offset': 5, 'limit': 10, 'results': names[5:15]}
+
+
+def test_practice_details(api, dataset_store):
+    name = dataset_store.refresh().df['Practice Name'][3]
+    status, body = _get(api, _path('api', 'practices', name))
+    assert status == 200
+    assert body['Practice Name'] == name
+    assert {'Latitude', 'Longitude', 'Full Address'} <= set(body)
+    assert _get(api, _path('api', 'practices', 'No Such Practice'))[0] == 404
+
+
+def test_missing_acquisition_dates_are_null(practice_files, org_store, tmp_path):
+    excel_path, coords_path = practice_files
+    practices = pd.read_excel(excel_path)
+    practices.loc[0, 'Acquisition date'] = None
+    practices.loc[1, 'Acquisition date'] = pd.Timestamp('2015-06-01')
+    practices.to_excel(excel_path, index=False, engine='xlsxwriter')
+    api = PracticeApi(DatasetStore(excel_path, coords_path, cache_dir=str(tmp_path / 'cache')).refresh, org_store)
+
+    assert _get(api, _path('api', 'practices', practices['Practice Name'][0]))[1]['Acquisition date'] is None
+    assert _get(api, _path('api', 'practices', practices['Practice Name'][1]))[1]['Acquisition date'].startswith('2015-06-01')
+
+
+def test_organization_follows_store_revisions(api, dataset_store, org_store):
+    name = dataset_store.refresh().df['Practice Name'][0]
+    target = _path('api', 'practices', name, 'organization')
+    assert _get(api, target) == (200, {'practice': name, 'organization': {}})
+    org_store.replace(name, ORGANIZATION)
+    assert _get(api, target) == (200, {'practice': name, 'organization': ORGANIZATION})
+
+
+def test_search_and_filter(api, dataset_store):
+    dataset = dataset_store.refresh()
+    status, body = _get(api, '/api/search?q=aar&limit=1000')
+    assert status == 200
+    assert body['results'] == dataset.prefix_index.search('aar')
+
+    status, body = _get(api, '/api/filter?term=england&column=Country&field=Practice%20Name&field=Country')
+    assert status == 200
+    assert body['total'] == int((dataset.df['Country'] == 'England').sum())
+    assert {row['Country'] for row in body['results']} == {'England'}
+    assert set(body['results'][0]) == {'Practice Name', 'Country'}
+
+
+@pytest.mark.parametrize('target, status', [
+    ('/api/search', 400),
+    ('/api/filter', 400),
+    ('/api/filter?term=a&column=Nope', 400),
+    ('/api/practices?limit=0', 400),
+    ('/api/practices?offset=x', 400),
+    ('/api/nearby', 400),
+    ('/api/nearby?lat=95&lon=0', 400),
+    ('/api/unknown', 404),
+    ('/other', 404),
+])
+def test_bad_requests(api, target, status):
+    code, body = _get(api, target)
+    assert code == status
+    assert 'error' in body
+
+
+def test_nearby_excludes_the_practice(api, dataset_store):
+    name = dataset_store.refresh().df['Practice Name'][0]
+    status, body = _get(api, f"/api/nearby?practice={urllib.parse.quote(name)}&n=3")
+    assert status == 200
+    distances = [row['Distance (km)'] for row in body['results']]
+    assert body['total'] == 3
+    assert distances == sorted(distances)
+    assert name not in [row['Practice Name'] for row in body['results']]
+
+
+def test_responses_are_cached_with_stable_etags(api):
+    first = api.handle('/api/practices?limit=3')
+    assert first[2] is not None
+    assert api.handle('/api/practices?limit=3') is first
+    assert api.handle('/api/practices?limit=4')[2] != first[2]
+
+
+def test_unavailable_dataset(org_store):
+    def broken():
+        raise FileNotFoundError('Coy Details.xlsx')
+
+    status, body = _get(PracticeApi(broken, org_store), '/api/practices')
+    assert status == 503
+    assert 'Coy Details.xlsx' in body['error']
@@ -0,0 +1,46 @@
+import pytest
+import requests
+
+from asset_server import AssetStore, asset_path, start_asset_server
+
+
+@pytest.fixture
+def server():
+    server = start_asset_server(AssetStore())
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _url(server, path):
+    return f'http://127.0.0.1:{server.server_address[1]}{path}'
+
+
+def test_assets_are_served_by_hash(server):
+    key = server.service.put('<p>Map</p>', 'text/html; charset=utf-8')
+    assert server.service.put(b'<p>Map</p>', 'text/html; charset=utf-8') == key
+    response = requests.get(_url(server, asset_path(key, 'practice map.html')))
+    assert response.status_code == 200
+    assert response.text == '<p>Map</p>'
+    assert response.headers['Content-Type'] == 'text/html; charset=utf-8'
+    assert 'immutable' in response.headers['Cache-Control']
+
+    revalidated = requests.get(_url(server, asset_path(key, 'map.html')), headers={'If-None-Match': f'"{key}"'})
+    assert revalidated.status_code == 304
+
+
+@pytest.mark.parametrize('path', ['/assets/unknown/map.html', '/other'])
+def test_unknown_paths(server, path):
+    assert requests.get(_url(server, path)).status_code == 404
+
+
+def test_store_evicts_least_recently_published():
+    store = AssetStore(max_bytes=10)
+    first = store.put(b'aaaa', 'image/svg+xml')
+    second = store.put(b'bbbb', 'image/svg+xml')
+    store.put(b'aaaa', 'image/svg+xml')
+    store.put(b'cccc', 'image/svg+xml')
+    assert store.get(first) == (b'aaaa', 'image/svg+xml')
+    assert store.get(second) is None
+    assert store.size_bytes == 8
+    assert store.put(b'x' * 11, 'image/svg+xml') is None
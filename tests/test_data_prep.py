@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_prep
+from data_prep import DatasetStore
+from perf import PerfRecorder
+
+
+def _write(practices, coords, excel_path, coords_path):
+    practices.to_excel(excel_path, index=False, engine='xlsxwriter')
+    coords.to_csv(coords_path, index=False)
+
+
+def _values(df):
+    # Compaction may pick another dtype for a reused column; compare values, with one missing marker
+    return df.astype(object).mask(df.isna())
+
+
+def _assert_same(reloaded, rebuilt):
+    pd.testing.assert_frame_equal(_values(reloaded.df), _values(rebuilt.df))
+    pd.testing.assert_series_equal(reloaded.acquisitions.cube, rebuilt.acquisitions.cube)
+    for year in rebuilt.acquisitions.years:
+        pd.testing.assert_frame_equal(reloaded.acquisitions.practices(year), rebuilt.acquisitions.practices(year))
+    pd.testing.assert_frame_equal(reloaded.acquisitions.no_date, rebuilt.acquisitions.no_date)
+    pd.testing.assert_frame_equal(reloaded.people.table, rebuilt.people.table)
+    for person in rebuilt.people.table['Person'].dropna().unique():
+        pd.testing.assert_frame_equal(reloaded.people.practices_for(person), rebuilt.people.practices_for(person))
+    for terms in (['a'], ['dental', 'dublin']):
+        assert np.array_equal(reloaded.text_index.mask(terms), rebuilt.text_index.mask(terms))
+
+
+@pytest.mark.parametrize('edit', ['names', 'removed', 'duplicated', 'coords', 'shuffled'])
+def test_reload_matches_a_full_rebuild(practice_files, tmp_path, edit):
+    excel_path, coords_path = practice_files
+    store = DatasetStore(excel_path, coords_path, cache_dir=str(tmp_path / 'cache'))
+    first = store.refresh()
+    first.acquisitions, first.people, first.text_index
+
+    practices = pd.read_excel(excel_path)
+    coords = pd.read_csv(coords_path)
+    if edit == 'names':
+        practices.loc[:4, 'Practice Name'] += ' Clinic'
+    elif edit == 'removed':
+        practices = practices.drop(index=range(10, 20))
+    elif edit == 'duplicated':
+        practices = pd.concat([practices, practices.iloc[[1, 1, 2]]], ignore_index=True)
+    elif edit == 'coords':
+        coords.loc[:9, 'Latitude'] += 0.5
+    else:
+        practices = practices.sample(frac=1, random_state=1)
+    _write(practices, coords, excel_path, coords_path)
+
+    reloaded = store.refresh()
+    assert reloaded is not first
+    assert reloaded.changed_rows < len(reloaded.df) or edit == 'shuffled'
+    rebuilt = DatasetStore(excel_path, coords_path, cache_dir=str(tmp_path / 'rebuilt')).refresh()
+    _assert_same(reloaded, rebuilt)
+
+
+def test_unchanged_rows_are_not_prepared_again(practice_files, tmp_path):
+    excel_path, coords_path = practice_files
+    store = DatasetStore(excel_path, coords_path, cache_dir=str(tmp_path / 'cache'))
+    store.refresh()
+    practices = pd.read_excel(excel_path)
+    practices.loc[3, 'Practice Name'] = 'Renamed Practice'
+    _write(practices, pd.read_csv(coords_path), excel_path, coords_path)
+
+    reloaded = store.refresh()
+    assert reloaded.changed_rows == 1
+    assert reloaded.df.loc[reloaded.previous_rows < 0, 'Practice Name'].tolist() == ['Renamed Practice']
+
+
+def test_failed_index_builds_are_retried(practice_files, tmp_path):
+    dataset = DatasetStore(*practice_files, cache_dir=str(tmp_path / 'cache')).refresh()
+    attempts = []
+
+    def build():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('interrupted')
+        return 'index'
+
+    with pytest.raises(OSError):
+        dataset._index('flaky', build)
+    assert dataset._index('flaky', build) == 'index'
+    assert dataset._index('flaky', build) == 'index'
+    assert len(attempts) == 2
+
+
+def test_builds_are_timed_without_a_page_run(practice_files, tmp_path, monkeypatch):
+    recorder = PerfRecorder()
+    monkeypatch.setattr(data_prep, 'recorder', recorder)
+    store = DatasetStore(*practice_files, cache_dir=str(tmp_path / 'cache'))
+    store.refresh().prefix_index
+    store._pool.shutdown(wait=True)
+    [run] = recorder.runs()
+    assert run['label'] == 'dataset reload'
+    stages = {stage['stage'] for stage in run['stages']}
+    assert {'load excel', 'load coords', 'fingerprint rows', 'prepare dataset', 'compact dataset',
+            'build text index', 'build prefix index', 'build spatial index', 'build people table'} <= stages
@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from export import pq, write_csv, write_parquet, write_xlsx
+
+needs_pyarrow = pytest.mark.skipif(pq is None, reason='pyarrow is not installed')
+
+
+def _frame():
+    # Compact dtypes as compact_practices leaves them, each with a missing value; the
+    # latitudes are exact in float32 so they print the same after the round trip
+    return pd.DataFrame({
+        'Practice Name': pd.array(['Aaron Optometrists', None, 'Optika', 'Optima', 'Vision Plus'],
+                                  dtype=pd.StringDtype('pyarrow' if pq is not None else 'python')),
+        'Country': pd.Categorical(['England', 'Ireland', None, 'England', 'Wales']),
+        'Notes': pd.Series([1, 'two', None, 3.5, 'five'], dtype=object),
+        'Latitude': np.array([51.5, 53.25, np.nan, 52.125, 51.75], dtype='float32'),
+    })
+
+
+def _values(df):
+    # Formats differ in how they type a column; compare values, with one missing marker
+    return df.astype(object).mask(df.isna(), None)
+
+
+def _round_trip(writer, read, df, **kwargs):
+    f = io.BytesIO()
+    writer(df, f, **kwargs)
+    f.seek(0)
+    return read(f)
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 10_000])
+def test_csv_round_trip(chunk_rows):
+    df = _frame()
+    read = _round_trip(write_csv, lambda f: pd.read_csv(f, dtype=str), df, chunk_rows=chunk_rows)
+    expected = _values(df).map(lambda value: None if value is None else str(value))
+    pd.testing.assert_frame_equal(_values(read), expected)
+
+
+@pytest.mark.parametrize('chunk_rows', [2, 10_000])
+def test_xlsx_round_trip(chunk_rows):
+    df = _frame()
+    read = _round_trip(write_xlsx, lambda f: pd.read_excel(f, dtype=object), df, chunk_rows=chunk_rows)
+    pd.testing.assert_frame_equal(_values(read), _values(df))
+
+
+@needs_pyarrow
+@pytest.mark.parametrize('chunk_rows', [2, 10_000])
+def test_parquet_round_trip(chunk_rows):
+    df = _frame()
+    read = _round_trip(write_parquet, pd.read_parquet, df, chunk_rows=chunk_rows)
+    assert isinstance(read['Country'].dtype, pd.CategoricalDtype)
+    assert read['Latitude'].dtype == 'float32'
+    # Mixed object columns are written as text
+    assert read['Notes'].tolist()[:2] == ['1', 'two']
+    pd.testing.assert_frame_equal(_values(read.drop(columns='Notes')), _values(df.drop(columns='Notes')))
+    assert read['Notes'].isna().tolist() == df['Notes'].isna().tolist()
+
+
+@pytest.mark.parametrize('writer, read', [
+    (write_csv, pd.read_csv),
+    (write_xlsx, pd.read_excel),
+    pytest.param(write_parquet, pd.read_parquet, marks=needs_pyarrow),
+])
+def test_empty_frame_keeps_header(writer, read):
+    df = _frame().iloc[:0]
+    read = _round_trip(writer, read, df, chunk_rows=2)
+    assert read.empty
+    assert list(read.columns) == list(df.columns)
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from geocode import geocode_practices, in_country, load_gazetteer, normalize_postcode, outward_code
+
+GAZETTEER = """postcode,latitude,longitude
+SW1A 1AA,51.501,-0.142
+SW1A 2AA,51.503,-0.128
+M1 1AE,53.48,-2.24
+M1 2AB,53.46,-2.22
+D02 X285,53.34,-6.26
+D02 AF30,53.32,-6.24
+"""
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    path = tmp_path / 'postcodes.csv'
+    path.write_text(GAZETTEER)
+    return str(path)
+
+
+def _practice(name, postcode, country):
+    return {'Practice Name': name, 'Post Code': postcode, 'Full Address': f'1 High Street, {postcode}',
+            'Country': country}
+
+
+def test_normalize_postcode_and_outward_code():
+    assert normalize_postcode(' sw1a  1aa ') == 'SW1A1AA'
+    assert normalize_postcode(np.nan) == ''
+    assert outward_code('SW1A1AA') == 'SW1A'
+    assert outward_code('M11AE') == 'M1'
+    # Not a UK postcode, so the Eircode routing key
+    assert outward_code('D02X285') == 'D02'
+
+
+def test_in_country():
+    assert in_country('Ireland', 53.34, -6.26)
+    assert not in_country('England', 57.0, -4.0)
+    assert not in_country('England', np.nan, -0.1)
+    # Countries without their own bounds only need to be in the British Isles
+    assert in_country('Channel Islands', 49.2, -2.1)
+
+
+def test_load_gazetteer_streams_chunks(gazetteer):
+    exact, districts = load_gazetteer(gazetteer, {'SW1A1AA', 'XX11XX'}, {'M1', 'D02'}, chunksize=2)
+    assert exact == {'SW1A1AA': (51.501, -0.142)}
+    assert districts.keys() == {'M1', 'D02'}
+    assert districts['M1'] == pytest.approx((53.47, -2.23))
+    assert districts['D02'] == pytest.approx((53.33, -6.25))
+
+
+def test_geocode_practices(gazetteer):
+    practices = pd.DataFrame([
+        _practice('Exact', 'sw1a 1aa', 'England'),
+        _practice('District', 'M1 9ZZ', 'England'),
+        _practice('Routing key', 'D02 YN77', 'Ireland'),
+        _practice('Misplaced', 'XX1 1XX', 'England'),
+        _practice('Unchanged', 'SW1A 2AA', 'England'),
+    ])
+    stored = practices[practices['Practice Name'].isin(['Misplaced', 'Unchanged'])]
+    coords_df = stored.drop(columns='Country').assign(Latitude=[57.0, 52.0], Longitude=[-4.0, -1.0])
+
+    coords, report = geocode_practices(practices, coords_df, gazetteer)
+
+    status = dict(zip(report['Practice Name'], report['Status']))
+    assert status == {'Exact': 'geocoded', 'District': 'geocoded (district centroid)',
+                      'Routing key': 'geocoded (district centroid)', 'Misplaced': 'outside country',
+                      'Unchanged': 'unchanged'}
+    assert list(coords.columns) == ['Practice Name', 'Post Code', 'Full Address', 'Latitude', 'Longitude']
+    located = coords.set_index('Practice Name')[['Latitude', 'Longitude']]
+    assert tuple(located.loc['Exact']) == (51.501, -0.142)
+    assert tuple(located.loc['District']) == pytest.approx((53.47, -2.23))
+    assert tuple(located.loc['Routing key']) == pytest.approx((53.33, -6.25))
+    # Stored coordinates are kept: valid ones are not looked up, and bad ones are flagged rather than dropped
+    assert tuple(located.loc['Misplaced']) == (57.0, -4.0)
+    assert tuple(located.loc['Unchanged']) == (52.0, -1.0)
@@ -0,0 +1,110 @@
+import concurrent.futures
+import json
+
+import pytest
+
+from org_store import CycleError, Hierarchy, OrgStore
+
+ORGANIZATION = {
+    'Director': {'name': 'Ann', 'reports': ['Manager']},
+    'Manager': {'name': 'Bob', 'reports': ['Optometrist', 'Receptionist']},
+    'Optometrist': {'name': 'Cat', 'reports': []},
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return OrgStore(str(tmp_path / 'org.db'))
+
+
+def test_replace_get_and_revisions(store, tmp_path):
+    assert store.get('Practice A') == {}
+    assert store.revision('Practice A') == 0
+    store.replace('Practice A', ORGANIZATION)
+    assert store.get('Practice A') == ORGANIZATION
+    assert list(store.get('Practice A')) == list(ORGANIZATION)
+    assert store.revision('Practice A') == 1
+    # A second store on the same file sees the write
+    assert OrgStore(str(tmp_path / 'org.db')).get('Practice A') == ORGANIZATION
+
+
+def test_put_role_keeps_position_and_delete_role(store):
+    store.replace('Practice A', ORGANIZATION)
+    store.put_role('Practice A', 'Manager', 'Bea', ['Optometrist'])
+    store.put_role('Practice A', 'Receptionist', 'Dee', [])
+    assert list(store.get('Practice A')) == ['Director', 'Manager', 'Optometrist', 'Receptionist']
+    assert store.get('Practice A')['Manager'] == {'name': 'Bea', 'reports': ['Optometrist']}
+    store.delete_role('Practice A', 'Optometrist')
+    assert list(store.get('Practice A')) == ['Director', 'Manager', 'Receptionist']
+    assert store.revision('Practice A') == 4
+
+
+def test_concurrent_writes_to_different_practices(store):
+    practices = [f'Practice {i}' for i in range(8)]
+
+    def add_roles(practice):
+        for role in range(5):
+            store.put_role(practice, f'Role {role}', practice, [])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(add_roles, practices))
+    for practice in practices:
+        assert list(store.get(practice)) == [f'Role {role}' for role in range(5)]
+        assert store.revision(practice) == 5
+
+
+def test_hierarchy_depths_and_descendants():
+    hierarchy = Hierarchy(ORGANIZATION)
+    assert hierarchy.depth == {'Director': 0, 'Manager': 1, 'Optometrist': 2, 'Receptionist': 2}
+    assert hierarchy.descendants['Director'] == {'Manager': 1, 'Optometrist': 2, 'Receptionist': 2}
+    assert hierarchy.parents['Receptionist'] == ['Manager']
+
+
+def test_hierarchy_rejects_cycles():
+    with pytest.raises(CycleError, match='Director -> Manager -> Director'):
+        Hierarchy({'Director': {'reports': ['Manager']}, 'Manager': {'reports': ['Director']}})
+
+
+def test_put_role_rejects_cycle_and_keeps_practice(store):
+    store.replace('Practice A', ORGANIZATION)
+    revision = store.revision('Practice A')
+    with pytest.raises(CycleError):
+        store.put_role('Practice A', 'Optometrist', 'Cat', ['Director'])
+    assert store.get('Practice A') == ORGANIZATION
+    assert store.revision('Practice A') == revision
+    assert store.reports_under('Director', 'Practice A') == [
+        ('Practice A', 'Manager', 1), ('Practice A', 'Optometrist', 2), ('Practice A', 'Receptionist', 2)]
+
+
+def test_put_role_reindexes_depths(store):
+    store.replace('Practice A', ORGANIZATION)
+    store.put_role('Practice A', 'Manager', 'Bea', ['Optometrist'])
+    assert list(store.get('Practice A')) == ['Director', 'Manager', 'Optometrist']
+    assert store.get('Practice A')['Manager'] == {'name': 'Bea', 'reports': ['Optometrist']}
+    assert store.roles_at_depth(2) == [('Practice A', 'Optometrist')]
+
+
+def test_sync_json_imports_changed_practices_only(store, tmp_path):
+    json_path = tmp_path / 'organizations.json'
+    cyclic = {'A': {'name': 'a', 'reports': ['B']}, 'B': {'name': 'b', 'reports': ['A']}}
+    json_path.write_text(json.dumps({'Practice A': ORGANIZATION, 'Practice B': ORGANIZATION, 'Looped': cyclic}))
+
+    count, skipped = store.sync_json(str(json_path))
+    assert count == 2
+    assert list(skipped) == ['Looped']
+    assert store.get('Looped') == {}
+
+    # An admin edit survives a sync while the practice's JSON entry is unchanged
+    store.put_role('Practice A', 'Director', 'Zoe', ['Manager'])
+    assert store.sync_json(str(json_path)) == (0, {'Looped': skipped['Looped']})
+    assert store.get('Practice A')['Director']['name'] == 'Zoe'
+
+    changed = dict(ORGANIZATION, Director={'name': 'Dan', 'reports': ['Manager']})
+    json_path.write_text(json.dumps({'Practice A': ORGANIZATION, 'Practice B': changed}))
+    assert store.sync_json(str(json_path)) == (1, {})
+    assert store.get('Practice A')['Director']['name'] == 'Zoe'
+    assert store.get('Practice B')['Director']['name'] == 'Dan'
+
+
+def test_sync_json_without_file(store, tmp_path):
+    assert store.sync_json(str(tmp_path / 'missing.json')) == (0, {})
@@ -0,0 +1,59 @@
+import threading
+import tracemalloc
+
+import pytest
+
+from perf import PerfRecorder
+
+
+@pytest.fixture
+def tracing():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def _stages(recorder):
+    return {stage['stage']: stage for run in recorder.runs() for stage in run['stages']}
+
+
+def test_nested_stages_keep_their_peaks(tracing):
+    recorder = PerfRecorder()
+    recorder.start_run()
+    with recorder.stage('outer'):
+        block = bytearray(8_000_000)
+        del block
+        with recorder.stage('inner'):
+            block = bytearray(1_000_000)
+            del block
+    stages = _stages(recorder)
+    assert 1_000_000 <= stages['inner']['peak_bytes'] < 8_000_000
+    assert stages['outer']['peak_bytes'] >= 8_000_000
+
+
+def test_stages_on_other_threads(tracing):
+    recorder = PerfRecorder()
+    run = recorder.start_run('page')
+
+    def work():
+        with recorder.stage('unattributed'):
+            pass
+        recorder.timed('attributed', run)(lambda: None)()
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+    assert len(recorder.runs()) == 1
+    assert list(_stages(recorder)) == ['attributed']
+
+
+def test_summary():
+    recorder = PerfRecorder()
+    recorder.start_run()
+    for _ in range(3):
+        with recorder.stage('step'):
+            pass
+    summary = recorder.summary()
+    assert summary['Stage'].tolist() == ['step']
+    assert summary['Calls'].tolist() == [3]
+    assert summary['Peak (KiB)'].isna().all()
@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+from reports import ReportStore, query_hash, report_definition
+
+
+def test_save_get_delete(tmp_path):
+    store = ReportStore(str(tmp_path / 'reports.json'))
+    definition = report_definition(terms=['paul', ''], practices=[' Aaron Optometrists ', None])
+    store.save('Pauls', definition)
+    assert store.names() == ['Pauls']
+    assert store.get('Pauls') == {'terms': ['paul'], 'search_columns': [],
+                                  'practices': ['Aaron Optometrists', ''], 'columns': []}
+    store.delete('Pauls')
+    assert store.names() == []
+    assert store.get('Pauls') is None
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / 'reports.json'
+    store = ReportStore(str(path))
+    store.save('Kept', report_definition(terms=['a']))
+    before = path.read_text()
+
+    with pytest.raises(TypeError):
+        store.save('Broken', {'terms': {object()}})
+    assert path.read_text() == before
+    assert json.loads(before) == {'Kept': report_definition(terms=['a'])}
+    assert os.listdir(tmp_path) == ['reports.json']
+
+
+def test_query_hash_ignores_columns():
+    base = report_definition(terms=['a'], columns=['Country'])
+    assert query_hash(base) == query_hash(dict(base, columns=['Practice Name']))
+    assert query_hash(base) != query_hash(dict(base, terms=['b']))
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from search_index import FuzzyMatcher, PrefixIndex, _trigrams, normalize_text
+from synthetic import make_practices
+
+
+def _dice(a, b):
+    a, b = _trigrams(normalize_text(a)), _trigrams(normalize_text(b))
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def test_normalize_text():
+    assert normalize_text('  Café-Zoë  OPTOM ') == 'cafe zoe optom'
+    assert normalize_text('Alan Miller - Irlam') == 'alan miller irlam'
+
+
+def test_prefix_index_word_matches_follow_prefix_matches():
+    index = PrefixIndex(['Optical Express', 'Alan Miller Optometrists', 'Aaron Opticians', None])
+    assert index.search('opt') == ['Optical Express', 'Aaron Opticians', 'Alan Miller Optometrists']
+    assert index.search('opt', tokens=False) == ['Optical Express']
+    assert index.search(' ') == []
+
+
+def test_match_exact_fuzzy_and_unmatched():
+    matcher = FuzzyMatcher(['Alan Miller - Irlam', 'Aaron Optometrists', 'Adlam and Coomber'])
+    matches = matcher.match(['alan miller irlam', 'Aaron Optometrist', 'nothing like it', '', '  ', None,
+                             'Aaron Optometrist'])
+    assert matches['Uploaded Name'].tolist() == ['alan miller irlam', 'Aaron Optometrist', 'nothing like it',
+                                                 'Aaron Optometrist']
+    assert matches['Matched Practice'].tolist()[:2] == ['Alan Miller - Irlam', 'Aaron Optometrists']
+    assert pd.isna(matches['Matched Practice'][2])
+    assert matches['Score'][0] == 1.0
+    assert matches['Score'][1] == round(_dice('Aaron Optometrist', 'Aaron Optometrists'), 3)
+
+
+def test_best_match_agrees_with_scoring_every_name():
+    names = make_practices(400)['Practice Name'].dropna().tolist()
+    matcher = FuzzyMatcher(names)
+    known = sorted(set(names))
+    rng = np.random.default_rng(1)
+    queries = [name.replace('a', 'e', 1)[:int(rng.integers(6, len(name) + 1))] for name in names[:150]]
+    for query, (match, score) in zip(queries, matcher._best_matches(queries)):
+        scores = [_dice(query, name) for name in known]
+        best = int(np.argmax(scores))
+        assert score == scores[best]
+        assert match == (known[best] if scores[best] >= matcher.threshold else None)
+
+
+def test_no_shared_trigrams():
+    assert FuzzyMatcher(['Aaron Optometrists']).best_match('zzzz') == (None, 0.0)
+    assert FuzzyMatcher([]).best_match('Aaron') == (None, 0.0)
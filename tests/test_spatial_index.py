@@ -0,0 +1,39 @@
+import numpy as np
+
+from spatial_index import GridIndex, haversine_km
+
+
+def _points(n=500):
+    rng = np.random.default_rng(0)
+    return rng.uniform(50.0, 58.5, n), rng.uniform(-8.0, 1.5, n)
+
+
+def test_within_matches_brute_force():
+    latitudes, longitudes = _points()
+    index = GridIndex(latitudes, longitudes)
+    distances = haversine_km(54.0, -2.0, latitudes, longitudes)
+    hits = index.within(54.0, -2.0, 60)
+    assert [position for position, _ in hits] == [int(i) for i in np.argsort(distances) if distances[i] <= 60]
+    assert np.allclose([distance for _, distance in hits], np.sort(distances[distances <= 60]))
+
+
+def test_nearest_skips_excluded_and_widens_search():
+    latitudes, longitudes = _points()
+    index = GridIndex(latitudes, longitudes, cell_degrees=0.1)
+    distances = haversine_km(latitudes[7], longitudes[7], latitudes, longitudes)
+    expected = [int(i) for i in np.argsort(distances) if i != 7][:5]
+    assert [position for position, _ in index.nearest(latitudes[7], longitudes[7], 5, exclude=(7,))] == expected
+    # Far outside the points the search radius has to grow until it finds them
+    assert len(index.nearest(0.0, 0.0, 3)) == 3
+
+
+def test_nearest_on_tiny_index():
+    index = GridIndex([51.5], [-0.1])
+    assert index.nearest(51.5, -0.1, 3, exclude=(0,)) == []
+    assert [position for position, _ in index.nearest(40.0, 10.0, 3)] == [0]
+    assert GridIndex([], []).within(51.5, -0.1, 10) == []
+
+
+def test_nearest_ignores_excluded_positions_outside_the_index():
+    index = GridIndex([51.5, 51.6], [-0.1, -0.1])
+    assert [position for position, _ in index.nearest(51.5, -0.1, 2, exclude=(0, 5, -1))] == [1]
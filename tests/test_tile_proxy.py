@@ -0,0 +1,110 @@
+import concurrent.futures
+import http.server
+import threading
+import time
+
+import pytest
+import requests
+
+from tile_proxy import TileCache, TileProxy, start_tile_server, tile_for
+
+PNG = b'\x89PNG\r\n\x1a\n'
+
+
+class StubTileHandler(http.server.BaseHTTPRequestHandler):
+    """Upstream tile server answering every tile with a PNG naming it, and /missing/* with 404."""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.paths.append(self.path)
+        time.sleep(self.server.delay)
+        if self.path.startswith('/missing/'):
+            self.send_error(404)
+            return
+        body = PNG + self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubTileHandler)
+    server.paths, server.lock, server.delay = [], threading.Lock(), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def proxy(upstream, tmp_path):
+    base = f'http://127.0.0.1:{upstream.server_address[1]}'
+    return TileProxy(TileCache(str(tmp_path / 'tiles')), sources={
+        'stub': base + '/{z}/{x}/{y}.png',
+        'broken': base + '/missing/{z}/{x}/{y}.png',
+    })
+
+
+@pytest.fixture
+def proxy_url(proxy):
+    server = start_tile_server(proxy)
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_tiles_are_fetched_once_then_served_from_cache(proxy_url, upstream):
+    first = requests.get(proxy_url + '/tiles/stub/3/2/1.png')
+    assert first.status_code == 200
+    assert first.headers['Content-Type'] == 'image/png'
+    assert first.content == PNG + b'/3/2/1.png'
+
+    second = requests.get(proxy_url + '/tiles/stub/3/2/1')
+    assert second.content == first.content
+    assert upstream.paths == ['/3/2/1.png']
+
+    revalidated = requests.get(proxy_url + '/tiles/stub/3/2/1.png', headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/tiles/unknown/3/2/1.png', 404),
+    ('/tiles/stub/3/8/1.png', 404),
+    ('/tiles/stub/x/2/1.png', 404),
+    ('/elsewhere', 404),
+    ('/tiles/broken/3/2/1.png', 502),
+])
+def test_errors(proxy_url, path, status):
+    assert requests.get(proxy_url + path).status_code == status
+
+
+def test_concurrent_misses_share_one_fetch(proxy, upstream):
+    upstream.delay = 0.2
+    with concurrent.futures.ThreadPoolExecutor(6) as pool:
+        tiles = list(pool.map(lambda _: proxy.tile('stub', 4, 5, 6), range(6)))
+    assert set(tiles) == {PNG + b'/4/5/6.png'}
+    assert upstream.paths == ['/4/5/6.png']
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    directory = str(tmp_path / 'tiles')
+    cache = TileCache(directory, max_bytes=25)
+    cache.put('osm', 1, 0, 0, b'a' * 10)
+    cache.put('osm', 1, 0, 1, b'b' * 10)
+    assert cache.get('osm', 1, 0, 0) == b'a' * 10
+    cache.put('osm', 1, 1, 0, b'c' * 10)
+    assert cache.get('osm', 1, 0, 1) is None
+    assert cache.size_bytes == 20
+    assert len(TileCache(directory, max_bytes=25)) == 2
+
+
+def test_tile_for():
+    assert tile_for(0.0, 0.0, 1) == (1, 1)
+    assert tile_for(51.5074, -0.1278, 10) == (511, 340)
+    assert tile_for(90.0, 180.0, 2) == (3, 0)
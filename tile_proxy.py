@@ -0,0 +1,335 @@
+"""Caching proxy for map tiles.
+
+Browsers load tiles from this proxy instead of straight from OpenStreetMap
+or Google. Tiles are kept in a size-bounded LRU cache on disk, concurrent
+requests for the same tile share one upstream fetch, and responses carry
+ETag and Cache-Control headers so browsers reuse them. The app starts the
+proxy itself; it can also be run on its own, or used to pre-fetch the tiles
+around every practice:
+
+    python tile_proxy.py serve [--port 8765]
+    python tile_proxy.py seed --zooms 13 14 15 [--source osm] [--radius 1]
+"""
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import http.server
+import math
+import os
+import sys
+import tempfile
+import threading
+
+import pandas as pd
+import requests
+
+from http_service import ServiceServer, start_server
+
+# Upstream URL templates, by the source name used in proxy URLs
+TILE_SOURCES = {
+    'osm': 'https://tile.openstreetmap.org/{z}/{x}/{y}.png',
+    'satellite': 'https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}',
+}
+
+TILE_CACHE_DIR = os.path.join('.cache', 'tiles')
+TILE_CACHE_BYTES = 512 * 1024 * 1024
+MAX_ZOOM = 20
+
+# How long browsers may reuse a tile before revalidating it
+BROWSER_MAX_AGE = 24 * 60 * 60
+
+# The OpenStreetMap tile usage policy asks clients to identify themselves
+USER_AGENT = 'Practices tile proxy (python-requests)'
+
+
+def _content_type(data):
+    if data.startswith(b'\x89PNG'):
+        return 'image/png'
+    if data.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if data[8:12] == b'WEBP':
+        return 'image/webp'
+    return 'application/octet-stream'
+
+
+class TileCache:
+    """Tiles on disk under ``directory``, dropping the least recently used beyond ``max_bytes``.
+
+    Recency survives restarts through file modification times, which are
+    bumped on every hit. Writes go through a temporary file and a rename so
+    readers never see half a tile.
+    """
+
+    def __init__(self, directory=TILE_CACHE_DIR, max_bytes=TILE_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Path -> size, oldest first
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+
+        found = []
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.endswith('.tmp'):
+                    # Left behind by an interrupted write
+                    os.remove(path)
+                    continue
+                found.append((stat.st_mtime_ns, path, stat.st_size))
+        with self._lock:
+            for _, path, size in sorted(found):
+                self._entries[path] = size
+                self._bytes += size
+            self._evict()
+
+    def _path(self, source, z, x, y):
+        return os.path.join(self.directory, source, str(z), str(x), str(y))
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def get(self, source, z, x, y):
+        """The cached tile, or None."""
+        path = self._path(source, z, x, y)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, source, z, x, y, data):
+        path = self._path(source, z, x, y)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, staging = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(staging, path)
+        except OSError:
+            # A full or read-only disk only costs us the cache
+            return
+        with self._lock:
+            self._bytes -= self._entries.pop(path, 0)
+            self._entries[path] = len(data)
+            self._bytes += len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            path, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class TileProxy:
+    """Serves tiles from a TileCache, fetching misses from the upstream ``sources``.
+
+    Concurrent requests for a tile that is not cached yet wait for a single
+    upstream fetch instead of each making their own.
+    """
+
+    def __init__(self, cache, sources=TILE_SOURCES, timeout=10):
+        self.cache = cache
+        self.sources = sources
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (source, z, x, y) -> Future of the fetch in progress
+        self._inflight = {}
+
+    def _session(self):
+        # requests sessions are not thread-safe, so each server thread keeps its own
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers['User-Agent'] = USER_AGENT
+        return session
+
+    def tile(self, source, z, x, y):
+        """The tile's bytes, from the cache or upstream.
+
+        Raises KeyError for an unknown source, ValueError for a tile outside
+        the map and requests.RequestException if the upstream fetch fails.
+        """
+        if source not in self.sources:
+            raise KeyError(source)
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise ValueError(f"No tile {z}/{x}/{y}")
+        key = (source, z, x, y)
+        data = self.cache.get(*key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            future = self._inflight.get(key)
+            fetching = future is None
+            if fetching:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not fetching:
+            return future.result()
+
+        try:
+            # Another thread may have finished this tile just before we registered
+            data = self.cache.get(*key)
+            if data is None:
+                response = self._session().get(self.sources[source].format(z=z, x=x, y=y), timeout=self.timeout)
+                response.raise_for_status()
+                data = response.content
+                self.cache.put(*key, data)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+
+class TileRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answers ``GET /tiles/<source>/<z>/<x>/<y>`` from the server's TileProxy."""
+
+    def do_GET(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) != 5 or parts[0] != 'tiles':
+            self.send_error(404)
+            return
+        try:
+            z, x, y = int(parts[2]), int(parts[3]), int(parts[4].split('.', 1)[0])
+            data = self.server.service.tile(parts[1], z, x, y)
+        except (KeyError, ValueError):
+            self.send_error(404)
+            return
+        except requests.RequestException as e:
+            self.send_error(502, explain=str(e))
+            return
+
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self._cache_headers(etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', _content_type(data))
+        self.send_header('Content-Length', str(len(data)))
+        self._cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={BROWSER_MAX_AGE}')
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def log_message(self, format, *args):
+        # Every tile is a request; keep them out of the app's console
+        pass
+
+
+def start_tile_server(proxy, host='127.0.0.1', port=0):
+    """Serve ``proxy`` from a daemon thread; see ``http_service.start_server``."""
+    return start_server(TileRequestHandler, proxy, host, port, 'tile-proxy')
+
+
+def tile_for(latitude, longitude, zoom):
+    """(x, y) of the Web Mercator tile containing the point at ``zoom``."""
+    n = 2 ** zoom
+    latitude = max(min(latitude, 85.0511), -85.0511)
+    x = int((longitude + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(latitude))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_around(points, zooms, radius=1):
+    """Sorted (z, x, y) tiles within ``radius`` tiles of any of the (latitude, longitude) ``points``."""
+    tiles = set()
+    for z in zooms:
+        n = 2 ** z
+        for latitude, longitude in points:
+            x, y = tile_for(latitude, longitude, z)
+            for dx in range(-radius, radius + 1):
+                for dy in range(-radius, radius + 1):
+                    if 0 <= y + dy < n:
+                        tiles.add((z, (x + dx) % n, y + dy))
+    return sorted(tiles)
+
+
+def seed(proxy, source, points, zooms, radius=1, workers=2):
+    """Fetch the tiles around ``points`` into the proxy's cache.
+
+    Returns the number of tiles now cached and a ``{(z, x, y): error}`` dict
+    for those that failed. Keep ``workers`` low for public tile servers.
+    """
+    tiles = tiles_around(points, zooms, radius)
+    failed = {}
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        futures = {pool.submit(proxy.tile, source, *tile): tile for tile in tiles}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except requests.RequestException as e:
+                failed[futures[future]] = str(e)
+    return len(tiles) - len(failed), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cache-dir', default=TILE_CACHE_DIR)
+    parser.add_argument('--max-mb', type=int, default=TILE_CACHE_BYTES // 2 ** 20, help='size limit of the tile cache')
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_parser = commands.add_parser('serve', help='run the proxy in the foreground')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    seed_parser = commands.add_parser('seed', help='pre-fetch the tiles around every practice')
+    seed_parser.add_argument('--coords', default='Practice Coords.csv')
+    seed_parser.add_argument('--source', choices=sorted(TILE_SOURCES), default='osm')
+    seed_parser.add_argument('--zooms', type=int, nargs='+', default=[13, 14, 15])
+    seed_parser.add_argument('--radius', type=int, default=1, help='tiles to fetch on each side of a practice')
+    seed_parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    proxy = TileProxy(TileCache(args.cache_dir, args.max_mb * 2 ** 20))
+    if args.command == 'serve':
+        server = ServiceServer((args.host, args.port), TileRequestHandler, proxy)
+        print(f'Serving tiles on http://{args.host}:{args.port}/tiles/<source>/<z>/<x>/<y>')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    coords = pd.read_csv(args.coords).dropna(subset=['Latitude', 'Longitude'])
+    points = list(zip(coords['Latitude'], coords['Longitude']))
+    cached, failed = seed(proxy, args.source, points, args.zooms, args.radius, args.workers)
+    print(f'{cached} tiles cached, {len(failed)} failed; cache holds {len(proxy.cache)} tiles '
+          f'({proxy.cache.size_bytes / 2 ** 20:.1f} MiB)')
+    for (z, x, y), error in sorted(failed.items())[:20]:
+        print(f'  {z}/{x}/{y}: {error}')
+    return 0 if not failed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())